@@ -0,0 +1,37 @@
+from django.contrib import admin
+
+from .models import SlowQuery
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """
+    Slow queries grouped by fingerprint, costliest first.
+    Rows are written by the slow query log on PostgreSQL only and are
+    read-only here.
+    """
+
+    list_display = (
+        'short_sql', 'view', 'source', 'count', 'average_seconds',
+        'max_seconds', 'total_seconds', 'last_seen',
+    )
+    list_filter = ('view',)
+    search_fields = ('sql', 'view', 'source', 'fingerprint')
+    readonly_fields = (
+        'fingerprint', 'view', 'source', 'sql', 'plan', 'count',
+        'total_seconds', 'max_seconds', 'first_seen', 'last_seen',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='SQL')
+    def short_sql(self, obj):
+        return obj.sql[:120]
+
+    @admin.display(description='Average seconds')
+    def average_seconds(self, obj):
+        return round(obj.total_seconds / obj.count, 4) if obj.count else 0
@@ -0,0 +1,187 @@
+import time
+from bisect import bisect_left, bisect_right
+
+from django.db.models import Count
+
+from recipes.models import Ingredient
+from .cache import INGREDIENTS_VERSION, get_versions, version_key
+from .constants import (AUTOCOMPLETE_FUZZY_BELOW,
+                        AUTOCOMPLETE_FUZZY_CANDIDATES, AUTOCOMPLETE_MAX_TYPOS,
+                        AUTOCOMPLETE_MIN_FUZZY_LENGTH,
+                        AUTOCOMPLETE_USAGE_REFRESH)
+
+PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(4)
+
+
+def normalize(value):
+    return value.lower().replace('ё', 'е').strip()
+
+
+def get_trigrams(value):
+    padded = f'  {value}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def prefix_distance_within(query, word, limit):
+    """
+    Check that some prefix of word is at most limit edits away from query.
+    The DP is abandoned as soon as every cell of a row exceeds the limit.
+    """
+    word = word[:len(query) + limit]
+    previous = list(range(len(word) + 1))
+    for i, query_char in enumerate(query, 1):
+        current = [i]
+        for j, word_char in enumerate(word, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (query_char != word_char),
+            ))
+        if min(current) > limit:
+            return False
+        previous = current
+    return min(previous[max(len(query) - limit, 0):]) <= limit
+
+
+class IngredientCatalog:
+    """Immutable snapshot of the ingredient catalog with lookup indexes."""
+
+    def __init__(self, ingredients, usage, version):
+        ingredients = sorted(
+            ingredients,
+            key=lambda item: (-usage.get(item['id'], 0), item['name']),
+        )
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.items = ingredients
+        self.names = [normalize(item['name']) for item in ingredients]
+        self.sorted_names = sorted(
+            (name, position) for position, name in enumerate(self.names)
+        )
+        # All names joined into one string, so substring search runs in C.
+        self.text = '\n'.join(self.names)
+        self.offsets = []
+        offset = 0
+        for name in self.names:
+            self.offsets.append(offset)
+            offset += len(name) + 1
+        self.trigrams = {}
+        for position, name in enumerate(self.names):
+            for trigram in get_trigrams(name):
+                self.trigrams.setdefault(trigram, []).append(position)
+
+    def find_prefix(self, query):
+        start = bisect_left(self.sorted_names, (query,))
+        end = bisect_right(self.sorted_names, (query + '\uffff',))
+        return [position for _, position in self.sorted_names[start:end]]
+
+    def find_substring(self, query):
+        positions = []
+        start = self.text.find(query)
+        while start != -1:
+            position = bisect_right(self.offsets, start) - 1
+            positions.append(position)
+            start = self.text.find(query, self.offsets[position] + len(
+                self.names[position]
+            ) + 1)
+        return positions
+
+    def get_word_tails(self, position):
+        """Return the name and every part of it starting at a word."""
+        name = self.names[position]
+        return [name] + [
+            name[index + 1:] for index, char in enumerate(name)
+            if char == ' '
+        ]
+
+    def find_fuzzy(self, query, needed):
+        """
+        Find names within a small edit distance of the query.
+        Candidates sharing the most trigrams with the query are verified
+        first and the search stops once enough matches are found.
+        """
+        limit = AUTOCOMPLETE_MAX_TYPOS if len(query) > 5 else 1
+        query_trigrams = get_trigrams(query)
+        hits = {}
+        for trigram in query_trigrams:
+            for position in self.trigrams.get(trigram, ()):
+                hits[position] = hits.get(position, 0) + 1
+        required = max(len(query_trigrams) - 3 * limit, 1)
+        candidates = sorted(
+            (position for position, shared in hits.items()
+             if shared >= required),
+            key=lambda position: (-hits[position], position),
+        )[:AUTOCOMPLETE_FUZZY_CANDIDATES]
+        positions = []
+        for position in candidates:
+            if any(
+                prefix_distance_within(query, tail, limit)
+                for tail in self.get_word_tails(position)
+            ):
+                positions.append(position)
+                if len(positions) >= needed:
+                    break
+        return positions
+
+
+class IngredientAutocomplete:
+    """
+    In-memory ingredient autocomplete.
+    The catalog is loaded once per worker and reloaded when the
+    ingredients version counter changes or the usage counts get old, so a
+    lookup normally reads the cache but not the database. Prefix matches
+    come first, then matches at the start of another word, then any
+    substring. Names within a small edit distance are added when there are
+    few direct matches. Inside each group ingredients used in more recipes
+    rank higher.
+    """
+
+    catalog = None
+
+    def get_catalog(self):
+        key = version_key(INGREDIENTS_VERSION)
+        version = get_versions((key,))[key]
+        catalog = self.catalog
+        if (catalog is None or catalog.version != version
+                or time.monotonic() - catalog.loaded_at
+                > AUTOCOMPLETE_USAGE_REFRESH):
+            usage = dict(
+                Ingredient.objects.annotate(
+                    usage=Count('recipeingredient')
+                ).values_list('id', 'usage')
+            )
+            catalog = self.catalog = IngredientCatalog(
+                Ingredient.objects.values('id', 'name', 'measurement_unit'),
+                usage,
+                version,
+            )
+        return catalog
+
+    def search(self, query, limit=None):
+        """Return ingredients matching the query, best matches first."""
+        catalog = self.get_catalog()
+        query = normalize(query)
+        if not query:
+            return catalog.items[:limit]
+        ranks = dict.fromkeys(catalog.find_prefix(query), PREFIX)
+        if limit is not None and len(ranks) >= limit:
+            positions = sorted(ranks)[:limit]
+            return [catalog.items[position] for position in positions]
+        for position in catalog.find_substring(query):
+            if position not in ranks:
+                ranks[position] = (
+                    WORD_PREFIX
+                    if f' {query}' in f' {catalog.names[position]}'
+                    else SUBSTRING
+                )
+        needed = (limit or AUTOCOMPLETE_FUZZY_BELOW) - len(ranks)
+        if len(query) >= AUTOCOMPLETE_MIN_FUZZY_LENGTH and needed > 0:
+            for position in catalog.find_fuzzy(query, needed):
+                ranks.setdefault(position, FUZZY)
+        positions = sorted(
+            ranks, key=lambda position: (ranks[position], position)
+        )
+        return [catalog.items[position] for position in positions[:limit]]
+
+
+ingredient_autocomplete = IngredientAutocomplete()
@@ -0,0 +1,97 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .constants import RECIPE_CACHE_TIMEOUT
+
+RECIPE_VERSION = 'recipe'
+AUTHOR_VERSION = 'author'
+TAGS_VERSION = 'tags'
+INGREDIENTS_VERSION = 'ingredients'
+RECIPES_VERSION = 'recipes'
+USERS_VERSION = 'users'
+USER_RELATIONS_VERSION = 'user_relations'
+
+
+def version_key(scope, obj_id=''):
+    return f'version:{scope}:{obj_id}'
+
+
+def get_versions(keys):
+    """
+    Return the current value of every version counter in keys.
+    Counters hold the time of the last change in nanoseconds. Missing
+    counters are seeded with the current time, so an evicted counter never
+    brings back an outdated cache entry.
+    """
+    keys = list(keys)
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            initial = time.time_ns()
+            if not cache.add(key, initial, None):
+                initial = cache.get(key, initial)
+            versions[key] = initial
+    return versions
+
+
+def bump_version(scope, obj_id=''):
+    """
+    Move a counter forward once the current transaction commits. A bump
+    made earlier would let a concurrent request cache the rows it still
+    sees under the new version, and serve them until the next write.
+    """
+    transaction.on_commit(
+        lambda: cache.set(version_key(scope, obj_id), time.time_ns(), None)
+    )
+
+
+class RecipeFragmentCache:
+    """
+    Cache of the viewer-independent part of RecipeReadSerializer output.
+    Entries are keyed by recipe id and by the versions of the recipe, its
+    author, tags and ingredients, so a write only has to bump a counter.
+    """
+
+    def __init__(self, scope=''):
+        self.scope = scope
+
+    def get_keys(self, recipes):
+        version_keys = {
+            version_key(TAGS_VERSION),
+            version_key(INGREDIENTS_VERSION),
+        }
+        for recipe in recipes:
+            version_keys.add(version_key(RECIPE_VERSION, recipe.id))
+            version_keys.add(version_key(AUTHOR_VERSION, recipe.author_id))
+        versions = get_versions(version_keys)
+        shared_version = (
+            f'{versions[version_key(TAGS_VERSION)]}.'
+            f'{versions[version_key(INGREDIENTS_VERSION)]}'
+        )
+        return {
+            recipe.id: (
+                f'recipe:{self.scope}:{recipe.id}:'
+                f'{versions[version_key(RECIPE_VERSION, recipe.id)]}.'
+                f'{versions[version_key(AUTHOR_VERSION, recipe.author_id)]}.'
+                f'{shared_version}'
+            )
+            for recipe in recipes
+        }
+
+    def get_many(self, recipes):
+        """Return {recipe id: fragment} for the cached recipes and the keys."""
+        keys = self.get_keys(recipes)
+        cached = cache.get_many(keys.values())
+        return {
+            recipe_id: cached[key]
+            for recipe_id, key in keys.items() if key in cached
+        }, keys
+
+    @staticmethod
+    def set_many(fragments, keys):
+        cache.set_many(
+            {keys[recipe_id]: data for recipe_id, data in fragments.items()},
+            RECIPE_CACHE_TIMEOUT,
+        )
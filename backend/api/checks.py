@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends whose entries only the process that wrote them can see.
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Version counters bumped by one gunicorn worker, the admin or a
+    management command must reach every other process, or they keep
+    serving outdated fragments, ETags and reference payloads.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            f'The default cache {backend} is not shared between '
+            'processes, so cached responses are never invalidated by '
+            'writes from other workers or management commands.',
+            hint='Set CACHE_BACKEND to memcached, a file based or a '
+                 'database cache.',
+            id='api.E001',
+        )
+    ]
@@ -0,0 +1,102 @@
+from datetime import datetime, timezone
+from functools import wraps
+from hashlib import md5
+
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from recipes.models import Recipe
+from .cache import (AUTHOR_VERSION, INGREDIENTS_VERSION, RECIPE_VERSION,
+                    RECIPES_VERSION, TAGS_VERSION, USER_RELATIONS_VERSION,
+                    USERS_VERSION, get_versions, version_key)
+
+
+def versioned_response(get_version_keys, per_user=True):
+    """
+    Decorator for viewset actions answering conditional GETs.
+    ETag and Last-Modified are built from the version counters returned by
+    get_version_keys(request, **kwargs), so a 304 is sent without running
+    the queryset or the serializers. Unless per_user is False, the counter
+    of the viewer's favorites, cart and subscriptions is folded in as well.
+    ETags are weak, as the same version may be sent gzipped or not.
+    """
+
+    def is_personal(request):
+        return per_user and request.user.is_authenticated
+
+    def get_request_versions(request, kwargs):
+        if not hasattr(request, '_validator_versions'):
+            keys = get_version_keys(request, **kwargs)
+            if keys is not None and is_personal(request):
+                keys.append(
+                    version_key(USER_RELATIONS_VERSION, request.user.id)
+                )
+            request._validator_versions = (
+                None if keys is None
+                else sorted(get_versions(keys).items())
+            )
+        return request._validator_versions
+
+    def etag_func(request, *args, **kwargs):
+        versions = get_request_versions(request, kwargs)
+        if versions is None:
+            return None
+        viewer = request.user.id if is_personal(request) else ''
+        digest = md5(
+            f'{request.get_full_path()}:{viewer}:{versions}'.encode()
+        ).hexdigest()
+        return f'W/"{digest}"'
+
+    def last_modified_func(request, *args, **kwargs):
+        versions = get_request_versions(request, kwargs)
+        if not versions:
+            return None
+        latest = max(version for _, version in versions)
+        return datetime.fromtimestamp(latest / 1e9, tz=timezone.utc)
+
+    def decorator(action):
+        conditional_action = condition(
+            etag_func=etag_func, last_modified_func=last_modified_func
+        )(action)
+
+        @wraps(action)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_action(request, *args, **kwargs)
+            if per_user:
+                patch_vary_headers(response, ('Authorization',))
+            return response
+        return wrapper
+    return decorator
+
+
+def recipe_list_versions(request, **kwargs):
+    return [version_key(RECIPES_VERSION)]
+
+
+def recipe_detail_versions(request, pk=None, **kwargs):
+    try:
+        author_id = Recipe.objects.filter(pk=pk).values_list(
+            'author_id', flat=True
+        ).first()
+    except (TypeError, ValueError):
+        return None
+    if author_id is None:
+        return None
+    return [
+        version_key(RECIPE_VERSION, pk),
+        version_key(AUTHOR_VERSION, author_id),
+        version_key(TAGS_VERSION),
+        version_key(INGREDIENTS_VERSION),
+    ]
+
+
+def tag_versions(request, **kwargs):
+    return [version_key(TAGS_VERSION)]
+
+
+def ingredient_versions(request, **kwargs):
+    return [version_key(INGREDIENTS_VERSION)]
+
+
+def user_versions(request, **kwargs):
+    return [version_key(USERS_VERSION)]
@@ -1,3 +1,20 @@
-RECIPE_PAGINATION_PAGE_SIZE = 6
-USER_PAGINATION_PAGE_SIZE = 10
-USER_PAGINATION_DEFAULT_LIMIT = 10
+RECIPE_PAGINATION_PAGE_SIZE = 6
+USER_PAGINATION_PAGE_SIZE = 10
+USER_PAGINATION_DEFAULT_LIMIT = 10
+# Largest value of a BigAutoField, cursors past it are rejected.
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+RECIPE_CACHE_TIMEOUT = 60 * 60
+# Tag and ingredient payloads requested by version change URL on change.
+REFERENCE_MAX_AGE = 365 * 24 * 60 * 60
+
+AUTOCOMPLETE_FUZZY_BELOW = 10
+AUTOCOMPLETE_FUZZY_CANDIDATES = 50
+AUTOCOMPLETE_MAX_TYPOS = 2
+AUTOCOMPLETE_MIN_FUZZY_LENGTH = 3
+AUTOCOMPLETE_USAGE_REFRESH = 10 * 60
+
+# Image variants served instead of the original in lists.
+LIST_IMAGE_VARIANT = 'card'
+SHORT_IMAGE_VARIANT = 'thumbnail'
+DEFAULT_IMAGE_FORMAT = 'jpeg'
@@ -0,0 +1,182 @@
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Tag
+
+INDEX_VERSION_KEY = 'version:recipe_bitmap_index'
+TRUE_VALUES = ('1', 'true', 'True')
+
+
+def bit_count(bitset):
+    return bin(bitset).count('1')
+
+
+def to_bitset(ids):
+    bitset = 0
+    for obj_id in ids:
+        bitset |= 1 << obj_id
+    return bitset
+
+
+class RecipeBitmapIndex:
+    """
+    In-memory bitmap index of recipes by tag and by author.
+    Every set is a Python int with bit N set for recipe id N, so counting
+    recipes for any filter combination is a few AND operations. The index
+    is updated in place on local writes and rebuilt when the shared version
+    counter shows that another process changed recipes or tags.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.recipes = 0
+        self.tags = {}
+        self.authors = {}
+        self.tag_info = []
+        self.slugs = {}
+
+    def get_shared_version(self):
+        version = cache.get(INDEX_VERSION_KEY)
+        if version is None:
+            cache.add(INDEX_VERSION_KEY, 1, None)
+            version = cache.get(INDEX_VERSION_KEY, 1)
+        return version
+
+    def build(self):
+        version = self.get_shared_version()
+        tag_info = list(
+            Tag.objects.order_by('id').values('id', 'name', 'color', 'slug')
+        )
+        tags = {tag['id']: 0 for tag in tag_info}
+        authors = {}
+        recipes = 0
+        for recipe_id, author_id in Recipe.objects.values_list(
+            'id', 'author_id'
+        ).order_by().iterator():
+            bit = 1 << recipe_id
+            recipes |= bit
+            authors[author_id] = authors.get(author_id, 0) | bit
+        for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id'
+        ).iterator():
+            tags[tag_id] = tags.get(tag_id, 0) | 1 << recipe_id
+        with self.lock:
+            self.recipes = recipes
+            self.tags = tags
+            self.authors = authors
+            self.tag_info = tag_info
+            self.slugs = {tag['slug']: tag['id'] for tag in tag_info}
+            self.version = version
+
+    def ensure_fresh(self):
+        if self.version != self.get_shared_version():
+            self.build()
+
+    def change(self, apply=None):
+        """
+        Apply a local change once the transaction commits and publish it
+        to the other processes by bumping the shared version.
+        """
+        def commit():
+            with self.lock:
+                if apply is not None and self.version is not None:
+                    apply()
+                try:
+                    version = cache.incr(INDEX_VERSION_KEY)
+                except ValueError:
+                    return
+                if (apply is not None and self.version is not None
+                        and version == self.version + 1):
+                    self.version = version
+        transaction.on_commit(commit)
+
+    def add_recipe(self, recipe_id, author_id):
+        def apply():
+            bit = 1 << recipe_id
+            self.recipes |= bit
+            self.authors[author_id] = self.authors.get(author_id, 0) | bit
+        self.change(apply)
+
+    def remove_recipe(self, recipe_id):
+        def apply():
+            mask = ~(1 << recipe_id)
+            self.recipes &= mask
+            for sets in (self.tags, self.authors):
+                for key in sets:
+                    sets[key] &= mask
+        self.change(apply)
+
+    def set_tags(self, recipe_ids, tag_ids, value):
+        def apply():
+            bits = to_bitset(recipe_ids)
+            for tag_id in tag_ids:
+                if value:
+                    self.tags[tag_id] = self.tags.get(tag_id, 0) | bits
+                elif tag_id in self.tags:
+                    self.tags[tag_id] &= ~bits
+        self.change(apply)
+
+    def clear_recipe_tags(self, recipe_id):
+        def apply():
+            mask = ~(1 << recipe_id)
+            for tag_id in self.tags:
+                self.tags[tag_id] &= mask
+        self.change(apply)
+
+    def mark_stale(self):
+        self.change()
+
+    def get_facets(self, user, params):
+        """
+        Count recipes per tag for the filters in params.
+        Author, favorites and shopping cart narrow every count. Selected
+        tags combine with OR, as in RecipeFilter, so they narrow the total
+        but not the per-tag counts.
+        """
+        self.ensure_fresh()
+        user_sets = []
+        if user.is_authenticated:
+            for param, model in (('is_favorited', FavoriteRecipe),
+                                 ('is_in_shopping_cart', ShoppingCart)):
+                if params.get(param) in TRUE_VALUES:
+                    user_sets.append(to_bitset(model.objects.filter(
+                        user=user
+                    ).values_list('recipe_id', flat=True)))
+        with self.lock:
+            base = self.recipes
+            author = params.get('author')
+            if author:
+                try:
+                    base &= self.authors.get(int(author), 0)
+                except ValueError:
+                    base = 0
+            for user_set in user_sets:
+                base &= user_set
+            selected = [
+                self.slugs[slug] for slug in params.getlist('tags')
+                if slug in self.slugs
+            ]
+            total = base
+            if params.getlist('tags'):
+                total &= self.union(selected)
+            return {
+                'count': bit_count(total),
+                'tags': [
+                    dict(tag, count=bit_count(
+                        base & self.tags.get(tag['id'], 0)
+                    ))
+                    for tag in self.tag_info
+                ],
+            }
+
+    def union(self, tag_ids):
+        bits = 0
+        for tag_id in tag_ids:
+            bits |= self.tags.get(tag_id, 0)
+        return bits
+
+
+recipe_index = RecipeBitmapIndex()
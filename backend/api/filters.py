@@ -1,9 +1,9 @@
 from django.contrib.auth import get_user_model
 from django_filters import FilterSet
 from django_filters import rest_framework as filters
-from rest_framework.filters import SearchFilter
 
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 
 User = get_user_model()
 
@@ -27,10 +27,18 @@ class RecipeFilter(FilterSet):
         label='Is favorited'
     )
 
+    search = filters.CharFilter(
+        method='filter_search',
+        label='Search by name, text or ingredients'
+    )
+
     class Meta:
         model = Recipe
         fields = ('tags', 'author',)
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
             return queryset.filter(cart__user=self.request.user)
@@ -40,9 +48,3 @@ class RecipeFilter(FilterSet):
         if self.request.user.is_authenticated and value:
             return queryset.filter(favorites__user=self.request.user)
         return queryset
-
-
-class IngredientSearchFilter(SearchFilter):
-    """Search filter for ingredients."""
-
-    search_param = 'name'
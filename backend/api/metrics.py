@@ -0,0 +1,247 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+# Upper bounds in seconds of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Seconds between writes of a worker's snapshot file. Busy workers write
+# it from record(), a background thread writes what idle ones left.
+FLUSH_INTERVAL = 5
+PREFIX = 'foodgram_http'
+# File holding the summed totals of the workers that exited.
+EXITED_FILE = 'exited.json'
+
+FIELDS = ('requests', 'seconds', 'queries', 'query_seconds', 'bytes')
+
+
+def empty_series():
+    series = dict.fromkeys(FIELDS, 0)
+    series['buckets'] = [0] * len(LATENCY_BUCKETS)
+    return series
+
+
+def merge_series(target, source):
+    for field in FIELDS:
+        target[field] += source[field]
+    target['buckets'] = [
+        total + count
+        for total, count in zip(target['buckets'], source['buckets'])
+    ]
+
+
+class MetricsRegistry:
+    """
+    Request metrics of this process keyed by view, method and status
+    class. With METRICS_DIR set every worker keeps its totals in a file
+    of its own named after its pid, and collect() sums all the files,
+    so the numbers cover every gunicorn worker. The gunicorn hooks call
+    reset() when the server starts and retire() when a worker exits, so
+    the totals start from zero with the server, while a new worker
+    reusing a pid does not pick up the counts of the old one.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.pid = None
+        self.flushed = 0
+        self.pending = False
+
+    @staticmethod
+    def get_path(pid):
+        return os.path.join(settings.METRICS_DIR, f'{pid}.json')
+
+    def ensure_process(self):
+        """Start from zero in every new process, forked workers too."""
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.series = {}
+        self.flushed = 0
+        self.pending = False
+        if settings.METRICS_DIR:
+            # Threads do not survive a fork, every worker starts its own.
+            threading.Thread(
+                target=self.flush_periodically,
+                args=(self.pid,),
+                name='metrics-flush',
+                daemon=True,
+            ).start()
+
+    def flush_periodically(self, pid):
+        """
+        Write the requests recorded since the last flush, so the totals
+        of a worker gone idle reach the scrape within FLUSH_INTERVAL.
+        """
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            with self.lock:
+                if self.pid != pid:
+                    return
+                if self.pending:
+                    self.flush()
+
+    @staticmethod
+    def read(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as metrics_file:
+                return {
+                    tuple(key): series
+                    for key, series in json.load(metrics_file)
+                }
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, key, seconds, queries, query_seconds, size):
+        with self.lock:
+            self.ensure_process()
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = empty_series()
+            series['requests'] += 1
+            series['seconds'] += seconds
+            series['queries'] += queries
+            series['query_seconds'] += query_seconds
+            series['bytes'] += size
+            bucket = bisect_left(LATENCY_BUCKETS, seconds)
+            if bucket < len(LATENCY_BUCKETS):
+                series['buckets'][bucket] += 1
+            self.pending = True
+            if time.monotonic() - self.flushed >= FLUSH_INTERVAL:
+                self.flush()
+
+    @staticmethod
+    def write(path, series):
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as metrics_file:
+            json.dump(list(series.items()), metrics_file)
+        os.replace(temporary, path)
+
+    def flush(self):
+        """Write the snapshot file; called with the lock held."""
+        self.flushed = time.monotonic()
+        self.pending = False
+        if settings.METRICS_DIR:
+            self.write(self.get_path(self.pid), self.series)
+
+    def save(self):
+        """Write the snapshot file now, as a worker exits."""
+        with self.lock:
+            self.ensure_process()
+            self.flush()
+
+    @staticmethod
+    def reset():
+        """Remove the files left by a previous run of the server."""
+        if not settings.METRICS_DIR:
+            return
+        try:
+            names = os.listdir(settings.METRICS_DIR)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(('.json', '.tmp')):
+                os.remove(os.path.join(settings.METRICS_DIR, name))
+
+    def retire(self, pid):
+        """
+        Fold the totals of an exited worker into EXITED_FILE and remove
+        its own file, keeping the sums growing while the pid is free to
+        be reused.
+        """
+        if not settings.METRICS_DIR:
+            return
+        path = self.get_path(pid)
+        series = self.read(path)
+        if series:
+            exited_path = os.path.join(settings.METRICS_DIR, EXITED_FILE)
+            totals = self.read(exited_path)
+            for key, worker_series in series.items():
+                merge_series(
+                    totals.setdefault(key, empty_series()), worker_series
+                )
+            self.write(exited_path, totals)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def collect(self):
+        """Return the series of all workers summed up."""
+        with self.lock:
+            self.ensure_process()
+            if not settings.METRICS_DIR:
+                return {
+                    key: dict(series, buckets=list(series['buckets']))
+                    for key, series in self.series.items()
+                }
+            self.flush()
+        totals = {}
+        for name in os.listdir(settings.METRICS_DIR):
+            if not name.endswith('.json'):
+                continue
+            for key, series in self.read(
+                os.path.join(settings.METRICS_DIR, name)
+            ).items():
+                merge_series(totals.setdefault(key, empty_series()), series)
+        return totals
+
+
+def format_labels(key, **extra):
+    view, method, status = key
+    labels = {'view': view, 'method': method, 'status': status, **extra}
+    return ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"'),
+        )
+        for name, value in labels.items()
+    )
+
+
+def render_metrics(totals):
+    """Render the series in the Prometheus text exposition format."""
+    lines = [
+        f'# HELP {PREFIX}_request_duration_seconds Request latency.',
+        f'# TYPE {PREFIX}_request_duration_seconds histogram',
+    ]
+    for key, series in sorted(totals.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, series['buckets']):
+            cumulative += count
+            lines.append(
+                f'{PREFIX}_request_duration_seconds_bucket'
+                f'{{{format_labels(key, le=bound)}}} {cumulative}'
+            )
+        labels = format_labels(key)
+        lines += [
+            f'{PREFIX}_request_duration_seconds_bucket'
+            f'{{{format_labels(key, le="+Inf")}}} {series["requests"]}',
+            f'{PREFIX}_request_duration_seconds_sum{{{labels}}} '
+            f'{series["seconds"]}',
+            f'{PREFIX}_request_duration_seconds_count{{{labels}}} '
+            f'{series["requests"]}',
+        ]
+    for field, name, description in (
+        ('queries', 'db_queries_total', 'Database queries run.'),
+        ('query_seconds', 'db_query_seconds_total',
+         'Time spent in database queries.'),
+        ('bytes', 'response_bytes_total', 'Response body bytes sent.'),
+    ):
+        lines += [
+            f'# HELP {PREFIX}_{name} {description}',
+            f'# TYPE {PREFIX}_{name} counter',
+        ]
+        lines += [
+            f'{PREFIX}_{name}{{{format_labels(key)}}} {series[field]}'
+            for key, series in sorted(totals.items())
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+metrics_registry = MetricsRegistry()
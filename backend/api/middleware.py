@@ -0,0 +1,102 @@
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import metrics_registry
+from .slow_queries import SlowQueryRecorder
+
+
+class QueryCounter:
+    """Execute wrapper counting queries and the time spent in them."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Record latency, database queries and response size of every request
+    under its resolved view name and method. Streaming responses are
+    measured until their last chunk is sent, as their queries run then.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        match = request.resolver_match
+        key = (
+            match.view_name if match is not None else 'unmatched',
+            request.method,
+            f'{response.status_code // 100}xx',
+        )
+        if response.streaming:
+            response.streaming_content = self.measure_stream(
+                response.streaming_content, key, started, counter
+            )
+        else:
+            metrics_registry.record(
+                key, time.perf_counter() - started, counter.queries,
+                counter.seconds, len(response.content)
+            )
+        return response
+
+    @staticmethod
+    def measure_stream(chunks, key, started, counter):
+        size = 0
+        try:
+            with connection.execute_wrapper(counter):
+                for chunk in chunks:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            metrics_registry.record(
+                key, time.perf_counter() - started, counter.queries,
+                counter.seconds, size
+            )
+
+
+class SlowQueryMiddleware:
+    """
+    Log the queries of a request slower than SLOW_QUERY_SECONDS with
+    their plans; a threshold of 0 turns the log off.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.SLOW_QUERY_SECONDS <= 0:
+            return self.get_response(request)
+        recorder = SlowQueryRecorder(request)
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.watch_stream(
+                response.streaming_content, recorder
+            )
+        else:
+            recorder.save()
+        return response
+
+    @staticmethod
+    def watch_stream(chunks, recorder):
+        try:
+            with connection.execute_wrapper(recorder):
+                yield from chunks
+        finally:
+            recorder.save()
@@ -0,0 +1,39 @@
+# Generated by Django 3.2 on 2026-10-17 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=32, verbose_name='Fingerprint')),
+                ('view', models.CharField(max_length=200, verbose_name='View')),
+                ('source', models.CharField(help_text='Serializer field or code location running the query.', max_length=200, verbose_name='Source')),
+                ('sql', models.TextField(verbose_name='Normalized SQL')),
+                ('plan', models.TextField(blank=True, verbose_name='Latest plan')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Count')),
+                ('total_seconds', models.FloatField(default=0, verbose_name='Total seconds')),
+                ('max_seconds', models.FloatField(default=0, verbose_name='Slowest seconds')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='First seen')),
+                ('last_seen', models.DateTimeField(auto_now=True, verbose_name='Last seen')),
+            ],
+            options={
+                'verbose_name': 'Slow query',
+                'verbose_name_plural': 'Slow queries',
+                'ordering': ('-total_seconds',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='slowquery',
+            constraint=models.UniqueConstraint(fields=('fingerprint', 'view', 'source'), name='unique_slow_query'),
+        ),
+    ]
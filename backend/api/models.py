@@ -0,0 +1,63 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """
+    Queries slower than SLOW_QUERY_SECONDS, aggregated by the fingerprint
+    of their normalized SQL and the view and code that issued them.
+    """
+
+    fingerprint = models.CharField(
+        'Fingerprint',
+        max_length=32,
+    )
+    view = models.CharField(
+        'View',
+        max_length=200,
+    )
+    source = models.CharField(
+        'Source',
+        max_length=200,
+        help_text='Serializer field or code location running the query.',
+    )
+    sql = models.TextField(
+        'Normalized SQL',
+    )
+    plan = models.TextField(
+        'Latest plan',
+        blank=True,
+    )
+    count = models.PositiveIntegerField(
+        'Count',
+        default=0,
+    )
+    total_seconds = models.FloatField(
+        'Total seconds',
+        default=0,
+    )
+    max_seconds = models.FloatField(
+        'Slowest seconds',
+        default=0,
+    )
+    first_seen = models.DateTimeField(
+        'First seen',
+        auto_now_add=True,
+    )
+    last_seen = models.DateTimeField(
+        'Last seen',
+        auto_now=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fingerprint', 'view', 'source'],
+                name='unique_slow_query'
+            )
+        ]
+        ordering = ('-total_seconds',)
+        verbose_name = 'Slow query'
+        verbose_name_plural = 'Slow queries'
+
+    def __str__(self) -> str:
+        return f'{self.view}: {self.sql[:80]}'
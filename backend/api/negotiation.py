@@ -0,0 +1,13 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FileFormatContentNegotiation(DefaultContentNegotiation):
+    """
+    Negotiation for views streaming files themselves. The format query
+    parameter or suffix names the file format there, so it must not
+    narrow the renderers: those only render error responses and are
+    chosen by the Accept header.
+    """
+
+    def filter_renderers(self, renderers, format):
+        return renderers
@@ -1,16 +1,167 @@
-from rest_framework.pagination import (LimitOffsetPagination,
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, LimitOffsetPagination,
                                        PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-from .constants import (RECIPE_PAGINATION_PAGE_SIZE,
+from recipes.models import Recipe
+from .constants import (MAX_CURSOR_ID, RECIPE_PAGINATION_PAGE_SIZE,
                         USER_PAGINATION_DEFAULT_LIMIT,
                         USER_PAGINATION_PAGE_SIZE)
 
 
+class RecipeCursorPagination(BasePagination):
+    """
+    Keyset pagination over recipes ordered by (-pub_date, -id).
+    Pages are selected with a seek condition on the last seen row, so
+    neither COUNT(*) nor OFFSET is executed however deep the client goes.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = RECIPE_PAGINATION_PAGE_SIZE
+    page_size_query_param = 'limit'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            pub_date = parse_datetime(tokens['d'][0])
+            recipe_id = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, IndexError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None or not 0 < recipe_id <= MAX_CURSOR_ID:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, recipe_id, reverse
+
+    def encode_cursor(self, recipe, reverse):
+        tokens = {'d': recipe.pub_date.isoformat(), 'i': recipe.id}
+        if reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def seek(self, queryset, cursor, reverse, date_field='pub_date',
+             id_field='id'):
+        """Order the queryset and keep the rows past the cursor."""
+        if cursor is not None:
+            pub_date, recipe_id = cursor[:2]
+            lookup = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__{lookup}': pub_date})
+                | Q(**{
+                    date_field: pub_date,
+                    f'{id_field}__{lookup}': recipe_id,
+                })
+            )
+        if reverse:
+            return queryset.order_by(date_field, id_field)
+        return queryset.order_by(f'-{date_field}', f'-{id_field}')
+
+    def get_rows(self, queryset, cursor, reverse):
+        """Return up to page_size + 1 recipes following the cursor."""
+        return list(
+            self.seek(queryset, cursor, reverse)[:self.page_size + 1]
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = remove_query_param(
+            request.build_absolute_uri(), 'page'
+        )
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+
+        results = self.get_rows(queryset, cursor, reverse)
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        self.next_url = self.previous_url = None
+        if self.page:
+            if has_more or reverse:
+                self.next_url = self.encode_cursor(self.page[-1], False)
+            if (has_more and reverse) or (cursor and not reverse):
+                self.previous_url = self.encode_cursor(self.page[0], True)
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.next_url),
+            ('previous', self.previous_url),
+            ('results', data),
+        ]))
+
+
+class FeedPagination(RecipeCursorPagination):
+    """
+    Keyset pagination over a feed made of several sources.
+    Every (queryset, date field, id field) source is seeked separately,
+    the keys are merged and only the recipes of the page are fetched.
+    """
+
+    def get_rows(self, sources, cursor, reverse):
+        keys = set()
+        for queryset, date_field, id_field in sources:
+            keys.update(
+                self.seek(
+                    queryset, cursor, reverse, date_field, id_field
+                ).values_list(date_field, id_field)[:self.page_size + 1]
+            )
+        keys = sorted(keys, reverse=not reverse)[:self.page_size + 1]
+        recipes = Recipe.objects.in_bulk([recipe_id for _, recipe_id in keys])
+        return [
+            recipes[recipe_id] for _, recipe_id in keys
+            if recipe_id in recipes
+        ]
+
+
 class RecipePagination(PageNumberPagination):
-    """Recipe list pagination."""
+    """
+    Recipe list pagination.
+    Page numbers are used by default, passing the ``cursor`` parameter
+    (empty for the first page) switches to keyset pagination.
+    """
 
     page_size = RECIPE_PAGINATION_PAGE_SIZE
     page_size_query_param = 'limit'
+    cursor_pagination_class = RecipeCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
 
 
 class UserPagination(PageNumberPagination, LimitOffsetPagination):
@@ -1,4 +1,7 @@
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticatedOrReadOnly
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from rest_framework.permissions import (SAFE_METHODS, BasePermission,
+                                        IsAuthenticatedOrReadOnly)
 
 
 class IsAdminOrReadOnly(IsAuthenticatedOrReadOnly):
@@ -15,3 +18,18 @@ class IsAdminOrReadOnly(IsAuthenticatedOrReadOnly):
                 or request.user.is_superuser
                 or obj.author == request.user
                 )
+
+
+class IsStaffOrMetricsToken(BasePermission):
+    """
+    Allow staff users, and scrapers sending METRICS_TOKEN as a bearer
+    token in the Authorization header.
+    """
+
+    def has_permission(self, request, view):
+        if request.user.is_staff:
+            return True
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        return bool(settings.METRICS_TOKEN) and constant_time_compare(
+            header, f'Bearer {settings.METRICS_TOKEN}'
+        )
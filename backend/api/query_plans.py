@@ -0,0 +1,242 @@
+import json
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from recipes.feed import backfill
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.search import is_postgresql, update_documents
+from recipes.shopping_list import rebuild
+from users.models import Subscribe
+
+User = get_user_model()
+
+PREFIX = 'plan-check'
+TAGS_PER_RECIPE = 2
+INGREDIENTS_PER_RECIPE = 5
+SUBSCRIPTIONS = 10
+SAVED_RECIPES = 20
+
+# Tables read whole by design: the tag catalog is tiny and both the
+# ingredient autocomplete and the facet index load their table at once.
+FULL_SCAN_TABLES = {
+    Tag._meta.db_table,
+    Ingredient._meta.db_table,
+}
+FACET_TABLES = {Recipe._meta.db_table, Recipe.tags.through._meta.db_table}
+
+# Request path, whether the viewer is logged in and the tables it may
+# scan whole besides FULL_SCAN_TABLES. {recipe}, {author} and {tag} are
+# filled from the checked dataset.
+HOT_REQUESTS = (
+    ('/api/recipes/', False, ()),
+    ('/api/recipes/?cursor=', False, ()),
+    ('/api/recipes/?author={author}', False, ()),
+    ('/api/recipes/?tags={tag}', False, ()),
+    ('/api/recipes/?is_favorited=1', True, ()),
+    ('/api/recipes/?is_in_shopping_cart=1', True, ()),
+    ('/api/recipes/?search=plan', False, ()),
+    ('/api/recipes/{recipe}/', True, ()),
+    ('/api/recipes/facets/', True, FACET_TABLES),
+    ('/api/recipes/feed/', True, ()),
+    ('/api/recipes/shopping_list/', True, ()),
+    ('/api/recipes/download_shopping_cart/', True, ()),
+    ('/api/users/', False, ()),
+    ('/api/users/{author}/', False, ()),
+    ('/api/users/subscriptions/', True, ()),
+    ('/api/ingredients/?name=plan', False, ()),
+    ('/api/tags/?format=json', False, ()),
+)
+
+
+def generate_dataset(size):
+    """
+    Insert size recipes with their authors, tags, ingredients and the
+    viewer's favorites, cart and subscriptions into the test database.
+    Rows are written in bulk, so no model signals are sent.
+    Return the viewer and the values filled into HOT_REQUESTS.
+    """
+    user_count = max(size // 10, SUBSCRIPTIONS + 1)
+    User.objects.bulk_create(
+        User(
+            username=f'{PREFIX}-{number}',
+            email=f'{PREFIX}-{number}@example.com',
+            first_name='Plan',
+            last_name='Check',
+            password='!',
+        )
+        for number in range(user_count)
+    )
+    users = list(User.objects.filter(username__startswith=PREFIX))
+    Tag.objects.bulk_create(
+        Tag(name=f'{PREFIX}-{number}', slug=f'{PREFIX}-{number}',
+            color=f'#c0de{number:04x}')
+        for number in range(TAGS_PER_RECIPE * 3)
+    )
+    tags = list(Tag.objects.filter(slug__startswith=PREFIX))
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'{PREFIX}-{number}', measurement_unit='g')
+        for number in range(INGREDIENTS_PER_RECIPE * 20)
+    )
+    ingredients = list(Ingredient.objects.filter(name__startswith=PREFIX))
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author=users[number % len(users)],
+                name=f'{PREFIX} recipe {number}',
+                text=f'{PREFIX} recipe',
+                cooking_time=10,
+                image=f'recipes/{PREFIX}.png',
+            )
+            for number in range(size)
+        ),
+        batch_size=1000,
+    )
+    recipes = list(
+        Recipe.objects.filter(name__startswith=PREFIX).order_by('id')
+    )
+    Recipe.tags.through.objects.bulk_create(
+        (
+            Recipe.tags.through(
+                recipe_id=recipe.id,
+                tag_id=tags[(number + offset) % len(tags)].id,
+            )
+            for number, recipe in enumerate(recipes)
+            for offset in range(TAGS_PER_RECIPE)
+        ),
+        batch_size=1000,
+    )
+    RecipeIngredient.objects.bulk_create(
+        (
+            RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[
+                    (number + offset) % len(ingredients)
+                ].id,
+                amount=offset + 1,
+            )
+            for number, recipe in enumerate(recipes)
+            for offset in range(INGREDIENTS_PER_RECIPE)
+        ),
+        batch_size=1000,
+    )
+    viewer, authors = users[0], users[1:SUBSCRIPTIONS + 1]
+    saved = recipes[:SAVED_RECIPES]
+    FavoriteRecipe.objects.bulk_create(
+        FavoriteRecipe(user=viewer, recipe=recipe) for recipe in saved
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=viewer, recipe=recipe) for recipe in saved
+    )
+    Subscribe.objects.bulk_create(
+        Subscribe(user=viewer, author=author) for author in authors
+    )
+    for author in authors:
+        backfill((viewer.id,), author.id)
+    rebuild((viewer.id,))
+    update_documents(recipe.id for recipe in recipes)
+    return viewer, {
+        'recipe': recipes[0].id,
+        'author': authors[0].id,
+        'tag': tags[0].slug,
+    }
+
+
+def capture_queries(path, user=None):
+    """Run a GET request through its view and return the SQL it ran."""
+    request = APIRequestFactory().get(path)
+    if user is not None:
+        force_authenticate(request, user=user)
+    match = resolve(urlsplit(path).path)
+    with CaptureQueriesContext(connection) as context:
+        response = match.func(request, *match.args, **match.kwargs)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        else:
+            response.render()
+    return response.status_code, [
+        query['sql'] for query in context.captured_queries
+        if query['sql'].lstrip().upper().startswith(('SELECT', 'WITH'))
+    ]
+
+
+def explain_sqlite(sql):
+    """
+    SQLite reports every sort as a temporary b-tree, so a sort is only
+    counted when its rows come from a table scan. Rows reached through
+    key or full-text lookups, like one user's cart, are few.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        plan = [row[-1] for row in cursor.fetchall()]
+    tables = set(connection.introspection.table_names())
+    scanned, scans, sorts = False, set(), []
+    for step in plan:
+        words = step.split()
+        if (words[0] == 'SCAN' and len(words) > 1 and words[1] in tables
+                and 'VIRTUAL' not in words):
+            scanned = True
+            if 'INDEX' not in words:
+                scans.add(words[1])
+        if 'TEMP B-TREE' in step:
+            sorts.append(step)
+    return plan, scans, sorts if scanned else []
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk_plan(child)
+
+
+def explain_postgresql(sql):
+    """
+    Plans are taken with sequential scans disabled, so a Seq Scan left
+    in the plan means no index can serve the query. ANALYZE reports the
+    sorts that spilled to temporary files.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+        cursor.execute('SET LOCAL enable_seqscan = on')
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans, sorts = set(), []
+    for node in walk_plan(plan[0]['Plan']):
+        if node['Node Type'] == 'Seq Scan':
+            scans.add(node['Relation Name'])
+        if node.get('Sort Space Type') == 'Disk':
+            sorts.append(f'{node["Node Type"]} {node.get("Sort Key")}')
+    return plan, scans, sorts
+
+
+def check_plans(viewer, values):
+    """
+    Yield (path, sql, problems) for every query of HOT_REQUESTS, the
+    problems being full scans of tables outside the allowed ones and
+    sorts through temporary storage.
+    """
+    explain = explain_postgresql if is_postgresql() else explain_sqlite
+    for path, authenticated, allowed in HOT_REQUESTS:
+        path = path.format(**values)
+        status, queries = capture_queries(
+            path, viewer if authenticated else None
+        )
+        if status != 200:
+            yield path, '', [f'responded with status {status}']
+            continue
+        for sql in queries:
+            _, scans, sorts = explain(sql)
+            problems = [
+                f'full scan of {table}' for table in sorted(
+                    scans - FULL_SCAN_TABLES - set(allowed)
+                )
+            ] + [f'temporary sort: {sort}' for sort in sorts]
+            yield path, sql, problems
@@ -0,0 +1,107 @@
+import gzip
+import threading
+
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.models import Ingredient, Tag
+from .cache import INGREDIENTS_VERSION, TAGS_VERSION, get_versions, version_key
+from .constants import REFERENCE_MAX_AGE
+from .serializers import IngredientSerializer, TagSerializer
+
+
+class CompiledPayload:
+    """Rendered JSON body together with its gzip variant."""
+
+    def __init__(self, data):
+        self.body = JSONRenderer().render(data)
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+
+    def to_response(self, request, **cache_control):
+        accepts_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        response = HttpResponse(
+            self.gzipped if accepts_gzip else self.body,
+            content_type='application/json',
+        )
+        if accepts_gzip:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        patch_cache_control(response, **cache_control)
+        return response
+
+
+class ReferenceData:
+    """
+    Precompiled list and detail responses for rarely changing data.
+    Payloads are built once per worker for the current version counter of
+    the data and rebuilt only after the counter changes.
+    """
+
+    version_query_param = 'v'
+
+    def __init__(self, queryset, serializer_class, version_scope):
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.version_key = version_key(version_scope)
+        self.lock = threading.Lock()
+        self.compiled = None
+
+    def get_compiled(self):
+        version = get_versions((self.version_key,))[self.version_key]
+        compiled = self.compiled
+        if compiled is None or compiled[0] != version:
+            with self.lock:
+                compiled = self.compiled
+                if compiled is None or compiled[0] != version:
+                    compiled = self.compiled = (version, *self.compile())
+        return compiled
+
+    def compile(self):
+        data = self.serializer_class(self.queryset.all(), many=True).data
+        return (
+            CompiledPayload(data),
+            {str(item['id']): CompiledPayload(item) for item in data},
+        )
+
+    def respond(self, request, version, payload):
+        """
+        Requests naming the current version in the v parameter are cached
+        for good, a change of the data changes that URL. Other requests
+        revalidate their ETag on every use and are pointed to the versioned
+        URL by Content-Location.
+        """
+        if request.query_params.get(self.version_query_param) == str(version):
+            return payload.to_response(
+                request, public=True, max_age=REFERENCE_MAX_AGE,
+                immutable=True,
+            )
+        response = payload.to_response(request, public=True, no_cache=True)
+        response['Content-Location'] = replace_query_param(
+            request.get_full_path(), self.version_query_param, version
+        )
+        return response
+
+    def list_response(self, request):
+        version, payload, _ = self.get_compiled()
+        return self.respond(request, version, payload)
+
+    def detail_response(self, request, pk):
+        """Return the precompiled object or None when it does not exist."""
+        version, _, details = self.get_compiled()
+        payload = details.get(str(pk))
+        return self.respond(request, version, payload) if payload else None
+
+
+def is_json_request(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == 'json'
+
+
+tag_reference = ReferenceData(
+    Tag.objects.all(), TagSerializer, TAGS_VERSION
+)
+ingredient_reference = ReferenceData(
+    Ingredient.objects.all(), IngredientSerializer, INGREDIENTS_VERSION
+)
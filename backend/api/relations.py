@@ -0,0 +1,61 @@
+from recipes.models import FavoriteRecipe, ShoppingCart
+from users.models import Subscribe
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+SUBSCRIPTIONS = 'subscriptions'
+
+RELATION_SOURCES = {
+    FAVORITES: (FavoriteRecipe, 'recipe_id'),
+    SHOPPING_CART: (ShoppingCart, 'recipe_id'),
+    SUBSCRIPTIONS: (Subscribe, 'author_id'),
+}
+
+
+class UserRelations:
+    """
+    Request-scoped loader of the current user's relations.
+    Resolves favorites, shopping cart and subscriptions for a batch of ids
+    with one query per relation kind and answers membership checks from
+    memory afterwards.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.checked = {kind: set() for kind in RELATION_SOURCES}
+        self.related = {kind: set() for kind in RELATION_SOURCES}
+
+    @property
+    def is_active(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    def load(self, kind, ids):
+        """Fetch the relations of the given kind for ids not loaded yet."""
+        ids = set(ids) - self.checked[kind]
+        if not ids or not self.is_active:
+            return
+        self.checked[kind] |= ids
+        model, field = RELATION_SOURCES[kind]
+        self.related[kind].update(
+            model.objects.filter(
+                user=self.user, **{f'{field}__in': ids}
+            ).values_list(field, flat=True)
+        )
+
+    def has(self, kind, obj_id):
+        if not self.is_active:
+            return False
+        self.load(kind, (obj_id,))
+        return obj_id in self.related[kind]
+
+
+def get_user_relations(context):
+    """Return the relations loader bound to the request in context."""
+    request = context.get('request')
+    if request is None:
+        return UserRelations(None)
+    relations = getattr(request, '_user_relations', None)
+    if relations is None:
+        relations = UserRelations(request.user)
+        request._user_relations = relations
+    return relations
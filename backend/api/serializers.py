@@ -1,17 +1,110 @@
+import json
 import logging
+from collections import OrderedDict
 
 from django.contrib.auth import get_user_model
-from django.db.models import F
+from django.core.files.uploadedfile import UploadedFile
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from recipes.images import get_variant_urls
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+                            RecipeIngredient, ShoppingCart, ShoppingListItem,
+                            Tag)
+from recipes.queries import get_latest_recipes
+from recipes.search import update_documents
+from recipes.shopping_list import change_recipe_ingredients
 from users.models import Subscribe
+from .cache import (RECIPE_VERSION, RECIPES_VERSION, RecipeFragmentCache,
+                    bump_version)
+from .constants import (DEFAULT_IMAGE_FORMAT, LIST_IMAGE_VARIANT,
+                        SHORT_IMAGE_VARIANT)
+from .relations import (FAVORITES, SHOPPING_CART, SUBSCRIPTIONS,
+                        get_user_relations)
 
 User = get_user_model()
 
 
+class RelationsListSerializer(serializers.ListSerializer):
+    """
+    List serializer that lets the child preload data for the whole list
+    before rendering, so per-item lookups are answered from memory.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        items = list(data)
+        self.child.preload(items)
+        return super().to_representation(items)
+
+
+def get_image_urls(recipe, context):
+    """Return the URLs of the recipe image variants."""
+    request = context.get('request')
+    return {
+        name: {
+            extension: request.build_absolute_uri(url) if request else url
+            for extension, url in urls.items()
+        }
+        for name, urls in get_variant_urls(recipe).items()
+    }
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field taking objects from the root serializer's preloaded
+    dict, filled with one query per model, instead of one query per id.
+    """
+
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        objects = getattr(self.root, 'preloaded', {}).get(model)
+        if objects is None:
+            return super().to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in objects:
+            self.fail('does_not_exist', pk_value=data)
+        return objects[pk]
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Image field accepting a base64 string or an uploaded file.
+    Uploads get the same type checks as base64 images, but are read from
+    the temporary file they were streamed to instead of from memory.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, UploadedFile):
+            return super().to_internal_value(data)
+        image = serializers.ImageField.to_internal_value(self, data)
+        extension = image.image.format.lower()
+        extension = 'jpg' if extension == 'jpeg' else extension
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        image.name = f'image.{extension}'
+        return image
+
+
+def parse_ids(values):
+    ids = set()
+    for value in values:
+        try:
+            if not isinstance(value, bool):
+                ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer for the User model with subscription information.
@@ -30,12 +123,15 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed'
         )
+        list_serializer_class = RelationsListSerializer
+
+    def preload(self, users):
+        get_user_relations(self.context).load(
+            SUBSCRIPTIONS, (user.id for user in users)
+        )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return bool(request and request.user.is_authenticated
-                    and obj.subscribers.filter(user=request.user).exists()
-                    )
+        return get_user_relations(self.context).has(SUBSCRIPTIONS, obj.id)
 
 
 class UserSubscriptionList(UserSerializer):
@@ -54,22 +150,45 @@ class UserSubscriptionList(UserSerializer):
             'recipes_count',
         )
 
-    def get_recipes(self, user):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.author_recipes = {}
+
+    def preload(self, users):
+        super().preload(users)
+        self.load_recipes([user.id for user in users])
+
+    def get_recipes_limit(self):
         request = self.context.get('request')
         recipes_limit = request.GET.get('recipes_limit')
-        recipes = Recipe.objects.filter(author=user)
-
-        if recipes_limit is not None:
-            try:
-                recipes = recipes[:int(recipes_limit)]
-            except Exception as e:
-                logging.warning(f'Arrived not int recipes limit {e}')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError as e:
+            logging.warning(f'Arrived not int recipes limit {e}')
+            return None
+        return recipes_limit if recipes_limit >= 0 else None
+
+    def load_recipes(self, author_ids):
+        """Fetch the latest recipes of all the authors in one query."""
+        recipes = {author_id: [] for author_id in author_ids}
+        for recipe in get_latest_recipes(
+            author_ids, self.get_recipes_limit()
+        ):
+            recipes[recipe.author_id].append(recipe)
+        self.author_recipes.update(recipes)
 
-        recipe_serializer = RecipeShortSerializer(recipes, many=True)
+    def get_recipes(self, user):
+        if user.id not in self.author_recipes:
+            self.load_recipes([user.id])
+        recipe_serializer = RecipeShortSerializer(
+            self.author_recipes[user.id], many=True
+        )
         return recipe_serializer.data
 
     def get_recipes_count(self, user):
-        return Recipe.objects.filter(author=user).count()
+        return user.recipes_count
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -142,6 +261,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField()
     author = UserSerializer()
     tags = TagSerializer(many=True)
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -154,29 +274,102 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
         )
+        list_serializer_class = RelationsListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fragments = {}
+
+    def preload(self, recipes):
+        relations = get_user_relations(self.context)
+        recipe_ids = [recipe.id for recipe in recipes]
+        relations.load(FAVORITES, recipe_ids)
+        relations.load(SHOPPING_CART, recipe_ids)
+        relations.load(
+            SUBSCRIPTIONS, (recipe.author_id for recipe in recipes)
+        )
+        self.load_fragments(recipes)
 
-    def get_ingredients(self, obj):
-        return obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('recipeingredient__amount')
+    @staticmethod
+    def prefetch(recipes):
+        prefetch_related_objects(
+            recipes,
+            'author',
+            'tags',
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ),
+            ),
         )
 
-    def get_is_favorited(self, recipe):
+    def get_fragment_cache(self):
         request = self.context.get('request')
-        return bool(request and request.user.is_authenticated
-                    and recipe.favorites.filter(user=request.user).exists()
-                    )
+        return RecipeFragmentCache(
+            request.build_absolute_uri('/') if request else ''
+        )
+
+    def load_fragments(self, recipes):
+        """
+        Take cached fragments of the recipes and render the missing ones,
+        fetching author, tags and ingredients in batched queries.
+        """
+        fragment_cache = self.get_fragment_cache()
+        fragments, keys = fragment_cache.get_many(recipes)
+        missing = [recipe for recipe in recipes if recipe.id not in fragments]
+        if missing:
+            self.prefetch(missing)
+            rendered = {
+                recipe.id: self.render_fragment(recipe) for recipe in missing
+            }
+            fragment_cache.set_many(rendered, keys)
+            fragments.update(rendered)
+        self.fragments.update(fragments)
+
+    def render_fragment(self, recipe):
+        return super().to_representation(recipe)
+
+    def to_representation(self, recipe):
+        if recipe.id not in self.fragments:
+            self.load_fragments([recipe])
+        fragment = self.fragments[recipe.id]
+        data = OrderedDict(fragment)
+        data['author'] = OrderedDict(fragment['author'])
+        data['author']['is_subscribed'] = get_user_relations(
+            self.context
+        ).has(SUBSCRIPTIONS, recipe.author_id)
+        data['is_favorited'] = self.get_is_favorited(recipe)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        if isinstance(self.parent, serializers.ListSerializer):
+            data['image'] = fragment['images'].get(
+                LIST_IMAGE_VARIANT, {}
+            ).get(DEFAULT_IMAGE_FORMAT, data['image'])
+        return data
+
+    def get_images(self, recipe):
+        return get_image_urls(recipe, self.context)
+
+    def get_ingredients(self, obj):
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in obj.recipeingredient_set.all()
+        ]
+
+    def get_is_favorited(self, recipe):
+        return get_user_relations(self.context).has(FAVORITES, recipe.id)
 
     def get_is_in_shopping_cart(self, recipe):
-        request = self.context.get('request')
-        return bool(request and request.user.is_authenticated
-                    and recipe.cart.filter(user=request.user).exists()
-                    )
+        return get_user_relations(self.context).has(SHOPPING_CART, recipe.id)
 
 
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
@@ -189,7 +382,7 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
         'invalid_quantity_amount': 'Invalid quantity ingredient amount',
         'invalid_type_amount': 'Invalid type ingredient amount',
     }
-    id = serializers.PrimaryKeyRelatedField(
+    id = PreloadedPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all())
     amount = serializers.IntegerField(required=True)
     name = serializers.SerializerMethodField()
@@ -231,14 +424,15 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         'ingredients_doesnt_exist': 'This ingredient does not exist in db',
         'no_image': 'Image is required',
         'incorrect_tag': 'Incorrect tag is provided.',
+        'invalid_ingredients': 'Ingredients must be a JSON list',
     }
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = PreloadedPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
     )
     ingredients = RecipeIngredientWriteSerializer(many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -252,30 +446,76 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('author',)
 
+    def parse_form_data(self, data):
+        """
+        Give multipart form data the shape of a JSON payload: tags are
+        repeated fields and ingredients a JSON encoded list.
+        """
+        parsed = {key: data.get(key) for key in data}
+        if 'tags' in data:
+            parsed['tags'] = data.getlist('tags')
+        if isinstance(parsed.get('ingredients'), str):
+            try:
+                parsed['ingredients'] = json.loads(parsed['ingredients'])
+            except ValueError:
+                raise serializers.ValidationError({
+                    'ingredients': [
+                        self.error_messages['invalid_ingredients']
+                    ]
+                })
+        return parsed
+
+    def to_internal_value(self, data):
+        """Resolve all tag and ingredient ids with one query each."""
+        if hasattr(data, 'getlist'):
+            data = self.parse_form_data(data)
+        tags = ingredients = None
+        if isinstance(data, dict):
+            tags = data.get('tags')
+            ingredients = data.get('ingredients')
+        self.preloaded = {
+            Tag: Tag.objects.in_bulk(
+                parse_ids(tags if isinstance(tags, list) else ())
+            ),
+            Ingredient: Ingredient.objects.in_bulk(parse_ids(
+                item.get('id') for item in (
+                    ingredients if isinstance(ingredients, list) else ()
+                )
+                if isinstance(item, dict)
+            )),
+        }
+        return super().to_internal_value(data)
+
     def validate(self, data):
         validated_data = super().validate(data)
         tags = validated_data.get('tags')
         ingredients = validated_data.get('ingredients')
         image = validated_data.get('image')
 
-        if not image:
+        if not image and self.is_required('image'):
             self.fail('no_image')
 
-        if not ingredients:
-            self.fail('no_ingredients')
-        ingredients_data = [
-            ingredient.get('id') for ingredient in ingredients
-        ]
-        if len(ingredients_data) != len(set(ingredients_data)):
-            self.fail('unique_ingredients')
-
-        if not tags:
-            self.fail('no_tags')
-        if len(tags) != len(set(tags)):
-            self.fail('unique_tags')
+        if self.is_required('ingredients'):
+            if not ingredients:
+                self.fail('no_ingredients')
+            ingredients_data = [
+                ingredient.get('id') for ingredient in ingredients
+            ]
+            if len(ingredients_data) != len(set(ingredients_data)):
+                self.fail('unique_ingredients')
+
+        if self.is_required('tags'):
+            if not tags:
+                self.fail('no_tags')
+            if len(tags) != len(set(tags)):
+                self.fail('unique_tags')
 
         return validated_data
 
+    def is_required(self, field_name):
+        """Partial updates check only the fields that were sent."""
+        return not self.partial or field_name in self.initial_data
+
     def add_ingredients(self, ingredients_data, recipe):
         recipe_ingredients = [
             RecipeIngredient(
@@ -285,28 +525,93 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
             for ingredient_data in ingredients_data
         ]
+        if not recipe_ingredients:
+            return
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        # bulk_create sends no signals, so update the shopping lists here.
+        changes = {}
+        for item in recipe_ingredients:
+            changes[item.ingredient_id] = (
+                changes.get(item.ingredient_id, 0) + item.amount
+            )
+        change_recipe_ingredients(recipe.id, changes)
 
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
         self.add_ingredients(ingredients_data, recipe)
+        update_documents((recipe.id,))
+        bump_version(RECIPE_VERSION, recipe.id)
+        bump_version(RECIPES_VERSION)
         return recipe
 
-    def update(self, recipe, validated_data):
-
-        tags_data = validated_data.pop('tags', [])
-        ingredients_data = validated_data.pop('ingredients', [])
+    def update_tags(self, recipe, tags_data):
+        current = set(recipe.tags.values_list('id', flat=True))
+        incoming = {tag.id for tag in tags_data}
+        if current - incoming:
+            recipe.tags.remove(*(current - incoming))
+        if incoming - current:
+            recipe.tags.add(*(incoming - current))
+
+    def update_ingredients(self, recipe, ingredients_data):
+        """
+        Bring the stored ingredients in line with the incoming ones,
+        touching only the rows that were added, removed or changed.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        incoming = {
+            ingredient_data.get('id').id: ingredient_data
+            for ingredient_data in ingredients_data
+        }
+        removed = [
+            item.id for ingredient_id, item in current.items()
+            if ingredient_id not in incoming
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+
+        changed = []
+        changes = {}
+        for ingredient_id, ingredient_data in incoming.items():
+            item = current.get(ingredient_id)
+            amount = ingredient_data.get('amount')
+            if item is not None and item.amount != amount:
+                changes[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+            # bulk_update sends no signals, so update the shopping lists here.
+            change_recipe_ingredients(recipe.id, changes)
+
+        self.add_ingredients(
+            [
+                ingredient_data for ingredient_id, ingredient_data
+                in incoming.items() if ingredient_id not in current
+            ],
+            recipe,
+        )
 
-        recipe.tags.clear()
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
+    @transaction.atomic
+    def update(self, recipe, validated_data):
+        tags_data = validated_data.pop('tags', None)
+        ingredients_data = validated_data.pop('ingredients', None)
 
-        recipe.tags.set(tags_data)
-        self.add_ingredients(ingredients_data, recipe)
+        if tags_data is not None:
+            self.update_tags(recipe, tags_data)
+        if ingredients_data is not None:
+            self.update_ingredients(recipe, ingredients_data)
 
-        return super().update(recipe, validated_data)
+        recipe = super().update(recipe, validated_data)
+        bump_version(RECIPE_VERSION, recipe.id)
+        bump_version(RECIPES_VERSION)
+        return recipe
 
     def to_representation(self, recipe):
         return RecipeReadSerializer(recipe).data
@@ -319,10 +624,17 @@ class RecipeShortSerializer(serializers.ModelSerializer):
     image, and cooking time.
     """
 
+    image = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def get_image(self, recipe):
+        return get_image_urls(recipe, self.context).get(
+            SHORT_IMAGE_VARIANT, {}
+        ).get(DEFAULT_IMAGE_FORMAT)
+
 
 class FavoritesShoppingCartMixInSerializer(serializers.ModelSerializer):
     """Mixin with validation to check duplicate and set representation."""
@@ -355,3 +667,17 @@ class FavoriteRecipeSerializer(FavoritesShoppingCartMixInSerializer):
 class ShoppingCartSerializer(FavoritesShoppingCartMixInSerializer):
     class Meta(FavoritesShoppingCartMixInSerializer.Meta):
         model = ShoppingCart
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Serializer for an ingredient total of the user's shopping list."""
+
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
@@ -0,0 +1,66 @@
+import csv
+import json
+
+from recipes.models import ShoppingListItem
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object returning what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list_rows(user):
+    """Iterate over the stored ingredient totals of the user's cart."""
+    return ShoppingListItem.objects.filter(
+        user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount',
+    ).order_by('ingredient__name').iterator(chunk_size=CHUNK_SIZE)
+
+
+def stream_txt(user, rows):
+    yield f'{user.first_name}, You need to buy the following:\n\n'
+    for row in rows:
+        yield (
+            f'- {row["ingredient__name"]} '
+            f'({row["ingredient__measurement_unit"]})'
+            f' - {row["amount"]}\n'
+        )
+    yield '\nWe look forward to seeing you again on our website!\n'
+
+
+def stream_csv(user, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow((
+            row['ingredient__name'],
+            row['ingredient__measurement_unit'],
+            row['amount'],
+        ))
+
+
+def stream_json(user, rows):
+    separator = '['
+    for row in rows:
+        yield separator + json.dumps({
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['amount'],
+        }, ensure_ascii=False, separators=(',', ':'))
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+# {format: (media type, writer)} of the shopping list downloads.
+SHOPPING_LIST_WRITERS = {
+    'txt': ('text/plain', stream_txt),
+    'csv': ('text/csv', stream_csv),
+    'json': ('application/json', stream_json),
+}
@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.signals import bulk_changed
+from users.models import Subscribe
+from .cache import (AUTHOR_VERSION, INGREDIENTS_VERSION, RECIPE_VERSION,
+                    RECIPES_VERSION, TAGS_VERSION, USER_RELATIONS_VERSION,
+                    USERS_VERSION, bump_version)
+from .facets import recipe_index
+
+User = get_user_model()
+
+AUTHOR_RENDERED_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    bump_version(RECIPE_VERSION, instance.id)
+    bump_version(RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    bump_version(RECIPE_VERSION, instance.recipe_id)
+    bump_version(RECIPES_VERSION)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_version(RECIPE_VERSION, instance.id)
+    elif pk_set:
+        for recipe_id in pk_set:
+            bump_version(RECIPE_VERSION, recipe_id)
+    else:
+        bump_version(TAGS_VERSION)
+    bump_version(RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete, bulk_changed), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump_version(TAGS_VERSION)
+    bump_version(RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete, bulk_changed), sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    bump_version(INGREDIENTS_VERSION)
+    bump_version(RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_author(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not AUTHOR_RENDERED_FIELDS & set(update_fields):
+        return
+    bump_version(AUTHOR_VERSION, instance.id)
+    bump_version(USERS_VERSION)
+    bump_version(RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscribe)
+def invalidate_user_relations(sender, instance, **kwargs):
+    bump_version(USER_RELATIONS_VERSION, instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, created, **kwargs):
+    if created:
+        recipe_index.add_recipe(instance.id, instance.author_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    recipe_index.remove_recipe(instance.id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def index_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        value = action == 'post_add'
+        if reverse:
+            recipe_index.set_tags(pk_set, (instance.id,), value)
+        else:
+            recipe_index.set_tags((instance.id,), pk_set, value)
+    elif action == 'post_clear':
+        if reverse:
+            recipe_index.mark_stale()
+        else:
+            recipe_index.clear_recipe_tags(instance.id)
+
+
+@receiver((post_save, post_delete, bulk_changed), sender=Tag)
+def reindex_tags(sender, **kwargs):
+    recipe_index.mark_stale()
+
+
+@receiver(bulk_changed, sender=Recipe)
+def invalidate_bulk_recipes(sender, **kwargs):
+    bump_version(RECIPES_VERSION)
+    recipe_index.mark_stale()
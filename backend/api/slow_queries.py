@@ -0,0 +1,181 @@
+import logging
+import os
+import re
+import sys
+import time
+from hashlib import md5
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.fields import Field
+from rest_framework.serializers import BaseSerializer
+
+from recipes.search import is_postgresql
+from .models import SlowQuery
+
+logger = logging.getLogger('foodgram.slow_queries')
+
+# Slow queries kept per request, so a pathological page cannot flood
+# the log with EXPLAIN runs.
+MAX_QUERIES_PER_REQUEST = 20
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+NORMALIZE_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%s|\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?, ...)'),
+    (re.compile(r'\s+'), ' '),
+)
+SOURCE_ROOT = str(settings.BASE_DIR)
+
+
+def normalize_sql(sql):
+    """Replace literals and placeholders so similar queries match."""
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def get_source():
+    """
+    Name the serializer field running the current query, or the closest
+    frame of project code when no serializer is involved.
+    """
+    location = ''
+    frame = sys._getframe(2)
+    while frame is not None:
+        owner = frame.f_locals.get('self')
+        if isinstance(owner, Field) and not isinstance(owner, BaseSerializer):
+            parent = type(owner.parent).__name__
+            return f'{parent}.{owner.field_name}'
+        if isinstance(owner, BaseSerializer):
+            return f'{type(owner).__name__}.{frame.f_code.co_name}'
+        filename = frame.f_code.co_filename
+        if (not location and filename.startswith(SOURCE_ROOT)
+                and filename != __file__):
+            location = (
+                f'{os.path.relpath(filename, SOURCE_ROOT)}:'
+                f'{frame.f_lineno} {frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+    return location or 'unknown'
+
+
+def explain(sql, params):
+    vendor = connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        return ''
+    prefix = 'EXPLAIN' if vendor == 'postgresql' else 'EXPLAIN QUERY PLAN'
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    except DatabaseError as error:
+        return f'EXPLAIN failed: {error}'
+
+
+def get_file_logger():
+    """Attach the rotating SLOW_QUERY_LOG file on first use."""
+    if settings.SLOW_QUERY_LOG and not logger.handlers:
+        directory = os.path.dirname(settings.SLOW_QUERY_LOG)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(
+            settings.SLOW_QUERY_LOG,
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.WARNING)
+    return logger
+
+
+def truncate(field_name, value):
+    return value[:SlowQuery._meta.get_field(field_name).max_length]
+
+
+def store(fingerprint, view, source, sql, plan, seconds):
+    # Long view names or code locations would not fit their columns.
+    lookup = {
+        'fingerprint': fingerprint,
+        'view': truncate('view', view),
+        'source': truncate('source', source),
+    }
+    changes = {
+        'count': F('count') + 1,
+        'total_seconds': F('total_seconds') + seconds,
+        'max_seconds': Greatest(F('max_seconds'), seconds),
+        'plan': plan,
+        # update() skips auto_now.
+        'last_seen': timezone.now(),
+    }
+    if SlowQuery.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            SlowQuery.objects.create(
+                sql=sql, plan=plan, count=1, total_seconds=seconds,
+                max_seconds=seconds, **lookup
+            )
+    except IntegrityError:
+        SlowQuery.objects.filter(**lookup).update(**changes)
+
+
+class SlowQueryRecorder:
+    """
+    Execute wrapper noting the queries of a request that take longer
+    than SLOW_QUERY_SECONDS. Plans are captured and the queries logged
+    by save(), once the response is done, so the view's own queries
+    and transactions are not disturbed. Only PostgreSQL also gets them
+    aggregated in SlowQuery rows: on SQLite those writes would turn
+    read requests into writers waiting for the database lock.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            if (seconds >= settings.SLOW_QUERY_SECONDS and not many
+                    and len(self.queries) < MAX_QUERIES_PER_REQUEST):
+                self.queries.append((sql, params, seconds, get_source()))
+
+    def get_view(self):
+        match = self.request.resolver_match
+        view_name = match.view_name if match is not None else 'unmatched'
+        return f'{self.request.method} {view_name}'
+
+    def save(self):
+        queries, self.queries = self.queries, []
+        if not queries:
+            return
+        view = self.get_view()
+        log = get_file_logger()
+        for sql, params, seconds, source in queries:
+            normalized = normalize_sql(sql)
+            fingerprint = md5(normalized.encode()).hexdigest()
+            is_select = sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+            plan = explain(sql, params) if is_select else ''
+            log.warning(
+                'slow query %.3fs view=%s source=%s fingerprint=%s\n'
+                '%s\n%s',
+                seconds, view, source, fingerprint, normalized, plan,
+            )
+            if not is_postgresql():
+                continue
+            try:
+                store(fingerprint, view, source, normalized, plan, seconds)
+            except DatabaseError:
+                log.exception('Could not store slow query %s', fingerprint)
@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.cache import RECIPES_VERSION, bump_version, get_versions, version_key
+from api.checks import check_shared_cache
+from foodgram.testing import IsolatedCacheMixin
+
+
+class BumpVersionTest(IsolatedCacheMixin, TestCase):
+
+    def test_bump_waits_for_commit(self):
+        key = version_key(RECIPES_VERSION)
+        version = get_versions((key,))[key]
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version(RECIPES_VERSION)
+            self.assertEqual(cache.get(key), version)
+        self.assertGreater(cache.get(key), version)
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+
+    def test_process_local_cache_fails(self):
+        backend = 'django.core.cache.backends.locmem.LocMemCache'
+        with override_settings(CACHES={'default': {'BACKEND': backend}}):
+            errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['api.E001'])
+
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
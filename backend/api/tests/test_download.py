@@ -0,0 +1,89 @@
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from foodgram.testing import IsolatedCacheMixin
+
+from recipes.models import Ingredient, ShoppingListItem
+
+User = get_user_model()
+
+
+class DownloadShoppingCartTest(IsolatedCacheMixin, APITestCase):
+    """
+    The format parameter selects the file writer, while errors keep the
+    regular API renderers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='First',
+            last_name='Last',
+            password='password',
+        )
+        for name, amount in (('salt', 5), ('flour', 200)):
+            ShoppingListItem.objects.create(
+                user=cls.user,
+                ingredient=Ingredient.objects.create(
+                    name=name, measurement_unit='g'
+                ),
+                amount=amount,
+            )
+        cls.url = reverse('api:recipe-download-shopping-cart')
+
+    def download(self, url=None, **params):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url or self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_formats(self):
+        response, content = self.download()
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8'
+        )
+        self.assertIn(
+            'user_shopping_list.txt', response['Content-Disposition']
+        )
+        self.assertIn('- salt (g) - 5', content)
+
+        response, content = self.download(format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(list(csv.reader(content.splitlines())), [
+            ['name', 'measurement_unit', 'amount'],
+            ['flour', 'g', '200'],
+            ['salt', 'g', '5'],
+        ])
+
+        response, content = self.download(format='json')
+        self.assertEqual(
+            response['Content-Type'], 'application/json; charset=utf-8'
+        )
+        self.assertEqual(json.loads(content), [
+            {'name': 'flour', 'measurement_unit': 'g', 'amount': 200},
+            {'name': 'salt', 'measurement_unit': 'g', 'amount': 5},
+        ])
+
+        response, content = self.download(reverse(
+            'api:recipe-download-shopping-cart', kwargs={'format': 'csv'}
+        ))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+
+    def test_errors_rendered_as_json(self):
+        for params in ({}, {'format': 'csv'}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Content-Type'], 'application/json')
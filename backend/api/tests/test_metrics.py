@@ -0,0 +1,121 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api.metrics import (EXITED_FILE, LATENCY_BUCKETS, MetricsRegistry,
+                         empty_series, render_metrics)
+
+KEY = ('api:recipe-list', 'GET', '2xx')
+
+
+def make_series(requests, seconds=0.5, queries=3, size=100):
+    series = empty_series()
+    series.update(
+        requests=requests,
+        seconds=seconds * requests,
+        queries=queries * requests,
+        query_seconds=0.01 * requests,
+        bytes=size * requests,
+    )
+    series['buckets'][LATENCY_BUCKETS.index(0.5)] = requests
+    return series
+
+
+class RenderMetricsTest(SimpleTestCase):
+
+    def test_histogram_and_counters(self):
+        text = render_metrics({KEY: make_series(2)})
+        labels = 'view="api:recipe-list",method="GET",status="2xx"'
+        self.assertIn(
+            f'foodgram_http_request_duration_seconds_bucket'
+            f'{{{labels},le="0.25"}} 0\n', text
+        )
+        self.assertIn(
+            f'foodgram_http_request_duration_seconds_bucket'
+            f'{{{labels},le="0.5"}} 2\n', text
+        )
+        self.assertIn(
+            f'foodgram_http_request_duration_seconds_bucket'
+            f'{{{labels},le="10"}} 2\n', text
+        )
+        self.assertIn(
+            f'foodgram_http_request_duration_seconds_bucket'
+            f'{{{labels},le="+Inf"}} 2\n', text
+        )
+        self.assertIn(
+            f'foodgram_http_request_duration_seconds_count{{{labels}}} 2\n',
+            text
+        )
+        self.assertIn(f'foodgram_http_db_queries_total{{{labels}}} 6\n', text)
+        self.assertIn(
+            f'foodgram_http_response_bytes_total{{{labels}}} 200\n', text
+        )
+        self.assertIn('# TYPE foodgram_http_db_queries_total counter\n', text)
+
+    def test_label_escaping(self):
+        text = render_metrics({('a"b\\c', 'GET', '2xx'): make_series(1)})
+        self.assertIn('view="a\\"b\\\\c"', text)
+
+
+class MetricsRegistryTest(SimpleTestCase):
+    """Totals of every worker file are summed and survive worker exits."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.registry = MetricsRegistry()
+
+    def test_merge_worker_files(self):
+        self.registry.write(self.registry.get_path(1), {KEY: make_series(2)})
+        self.registry.write(self.registry.get_path(2), {KEY: make_series(3)})
+        self.registry.record(KEY, 0.5, 3, 0.01, 100)
+        totals = self.registry.collect()
+        self.assertEqual(totals[KEY]['requests'], 6)
+        self.assertEqual(totals[KEY]['queries'], 18)
+        self.assertEqual(totals[KEY]['bytes'], 600)
+        self.assertEqual(
+            totals[KEY]['buckets'][LATENCY_BUCKETS.index(0.5)], 6
+        )
+
+    def test_retire_keeps_totals_and_frees_pid(self):
+        self.registry.write(self.registry.get_path(1), {KEY: make_series(2)})
+        self.registry.write(self.registry.get_path(2), {KEY: make_series(3)})
+        self.registry.retire(1)
+        self.registry.retire(2)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)), [EXITED_FILE]
+        )
+        self.assertEqual(self.registry.collect()[KEY]['requests'], 5)
+
+    def test_new_process_starts_from_zero(self):
+        self.registry.write(
+            self.registry.get_path(os.getpid()), {KEY: make_series(4)}
+        )
+        self.registry.record(KEY, 0.5, 3, 0.01, 100)
+        self.assertEqual(self.registry.collect()[KEY]['requests'], 1)
+
+    def test_reset(self):
+        self.registry.write(self.registry.get_path(1), {KEY: make_series(2)})
+        self.registry.retire(1)
+        MetricsRegistry.reset()
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(self.registry.collect(), {})
+
+    @mock.patch('api.metrics.FLUSH_INTERVAL', 0.2)
+    def test_idle_worker_flushed(self):
+        path = self.registry.get_path(os.getpid())
+        self.registry.record(KEY, 0.5, 3, 0.01, 100)
+        self.registry.record(KEY, 0.5, 3, 0.01, 100)
+        self.assertEqual(self.registry.read(path)[KEY]['requests'], 1)
+        deadline = time.monotonic() + 5
+        while (self.registry.read(path)[KEY]['requests'] < 2
+               and time.monotonic() < deadline):
+            time.sleep(0.05)
+        self.assertEqual(self.registry.read(path)[KEY]['requests'], 2)
@@ -0,0 +1,114 @@
+from base64 import b64encode
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from foodgram.testing import IsolatedCacheMixin
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+RECIPES = 7
+PAGE_SIZE = 2
+
+
+def encode(querystring):
+    return b64encode(querystring.encode()).decode()
+
+
+class RecipeCursorPaginationTest(IsolatedCacheMixin, APITestCase):
+    """
+    Keyset pages neither skip nor repeat recipes sharing a pub_date,
+    walk back through the previous links and reject broken cursors.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='First',
+            last_name='Last',
+            password='password',
+        )
+        for number in range(RECIPES):
+            Recipe.objects.create(
+                author=author,
+                name=f'recipe{number}',
+                text='text',
+                cooking_time=10,
+                image='recipes/recipe.png',
+            )
+        # Ties on pub_date are broken by id alone.
+        Recipe.objects.update(
+            pub_date=datetime(2024, 1, 1, tzinfo=timezone.utc)
+        )
+        cls.ids = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)
+        )
+        cls.url = reverse('api:recipe-list')
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def walk(self, url, link):
+        pages = []
+        while url is not None:
+            data = self.get_page(url)
+            pages.append([recipe['id'] for recipe in data['results']])
+            url = data[link]
+        return pages
+
+    def test_equal_pub_dates(self):
+        first = f'{self.url}?cursor=&limit={PAGE_SIZE}'
+        self.assertIsNone(self.get_page(first)['previous'])
+        pages = self.walk(first, 'next')
+        self.assertEqual(
+            pages,
+            [
+                self.ids[start:start + PAGE_SIZE]
+                for start in range(0, RECIPES, PAGE_SIZE)
+            ],
+        )
+
+    def test_previous_links(self):
+        url = f'{self.url}?cursor=&limit={PAGE_SIZE}'
+        forward = []
+        while True:
+            data = self.get_page(url)
+            forward.append([recipe['id'] for recipe in data['results']])
+            if data['next'] is None:
+                break
+            url = data['next']
+        previous = data['previous']
+        self.assertIsNotNone(previous)
+        backward = self.walk(previous, 'previous')
+        self.assertEqual(backward, forward[-2::-1])
+
+        data = self.get_page(self.get_page(previous)['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']], forward[-1]
+        )
+
+    def test_malformed_cursor(self):
+        for cursor in (
+            '!!!',
+            'é',
+            'YQ',
+            encode('garbage'),
+            encode('i=1'),
+            encode('d=2024-01-01T00:00:00%2B00:00'),
+            encode('d=yesterday&i=1'),
+            encode('d=2024-13-45T00:00:00%2B00:00&i=1'),
+            encode('d=2024-01-01T00:00:00%2B00:00&i=one'),
+            encode(f'd=2024-01-01T00:00:00%2B00:00&i={10 ** 30}'),
+            encode('d=2024-01-01T00:00:00%2B00:00&i=1&r=yes'),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
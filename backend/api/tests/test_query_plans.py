@@ -0,0 +1,41 @@
+from django.test import TestCase
+
+from api.facets import recipe_index
+from api.query_plans import check_plans, generate_dataset
+from foodgram.testing import IsolatedCacheMixin
+
+# Recipes generated on the test database, enough for the planner to
+# prefer indexes over scans where they exist.
+DATASET_SIZE = 2000
+
+
+class QueryPlansTest(IsolatedCacheMixin, TestCase):
+    """
+    The queries of the hot API requests must not scan whole tables or
+    sort them through temporary storage. Dropping an index they rely on
+    fails this test.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer, cls.values = generate_dataset(DATASET_SIZE)
+
+    def setUp(self):
+        # Cached fragments and a built facet index would hide queries.
+        super().setUp()
+        self.reset_facet_index()
+        self.addCleanup(self.reset_facet_index)
+
+    @staticmethod
+    def reset_facet_index():
+        # Its version lives in the cache, which is new for every test,
+        # so the index is made to rebuild from the test database.
+        recipe_index.version = None
+
+    def test_hot_requests(self):
+        checked = 0
+        for path, sql, problems in check_plans(self.viewer, self.values):
+            checked += 1
+            with self.subTest(path=path, sql=sql):
+                self.assertEqual(problems, [])
+        self.assertGreater(checked, 0)
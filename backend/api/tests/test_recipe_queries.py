@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from foodgram.testing import IsolatedCacheMixin
+
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from users.models import Subscribe
+
+User = get_user_model()
+
+RECIPES = 8
+
+
+class RecipeQueryCountTest(IsolatedCacheMixin, APITestCase):
+    """
+    Recipe reads must run a fixed number of queries, whatever the page
+    size, so a dropped prefetch fails here instead of in production.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer, *authors = (
+            User.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name='First',
+                last_name='Last',
+                password='password',
+            )
+            for number in range(3)
+        )
+        tags = [
+            Tag.objects.create(
+                name=f'tag{number}', slug=f'tag{number}',
+                color=f'#00000{number}'
+            )
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{number}', measurement_unit='g'
+            )
+            for number in range(4)
+        ]
+        cls.recipes = []
+        for number in range(RECIPES):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'recipe{number}',
+                text='text',
+                cooking_time=10,
+                image='recipes/recipe.png',
+            )
+            recipe.tags.set(tags[:number % len(tags) + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients[:number % len(ingredients) + 1]
+            )
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[::2]:
+            FavoriteRecipe.objects.create(user=cls.viewer, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.viewer, recipe=recipe)
+        Subscribe.objects.create(user=cls.viewer, author=authors[0])
+
+    def assert_queries(self, queries, url, viewer=None):
+        # Cached recipe fragments would hide the queries under test.
+        self.use_empty_cache()
+        self.client.force_authenticate(viewer)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        url = reverse('api:recipe-list')
+        for viewer, queries in ((None, 5), (self.viewer, 8)):
+            for limit in (6, 100):
+                with self.subTest(viewer=viewer, limit=limit):
+                    self.assert_queries(
+                        queries, f'{url}?limit={limit}', viewer
+                    )
+
+    def test_detail(self):
+        url = reverse('api:recipe-detail', args=(self.recipes[0].id,))
+        for viewer, queries in ((None, 5), (self.viewer, 8)):
+            with self.subTest(viewer=viewer):
+                self.assert_queries(queries, url, viewer)
@@ -0,0 +1,154 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from foodgram.testing import IsolatedCacheMixin
+
+from recipes.constants import IMAGE_FORMATS, IMAGE_VARIANTS
+from recipes.images import get_variant_path
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+
+IMAGE = 'recipes/recipe.png'
+
+User = get_user_model()
+
+
+class RecipeUpdateTest(IsolatedCacheMixin, APITestCase):
+    """
+    A PATCH touches only the ingredient and tag rows it changes, and the
+    shopping lists and cached recipe fragments follow it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.buyer = (
+            User.objects.create_user(
+                email=f'{username}@example.com',
+                username=username,
+                first_name='First',
+                last_name='Last',
+                password='password',
+            )
+            for username in ('author', 'buyer')
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'tag{number}', slug=f'tag{number}',
+                color=f'#00000{number}'
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{number}', measurement_unit='g'
+            )
+            for number in range(3)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='recipe',
+            text='text',
+            cooking_time=10,
+            image=IMAGE,
+            # Processed already, so commits do not start the image pool.
+            image_variants={
+                'source': IMAGE,
+                **{
+                    name: {
+                        extension: get_variant_path(IMAGE, name, extension)
+                        for extension in IMAGE_FORMATS
+                    }
+                    for name in IMAGE_VARIANTS
+                },
+            },
+        )
+        cls.recipe.tags.set(cls.tags[:2])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=cls.recipe, ingredient=ingredient, amount=10
+            )
+            for ingredient in cls.ingredients
+        )
+        ShoppingCart.objects.create(user=cls.buyer, recipe=cls.recipe)
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:recipe-detail', args=(self.recipe.id,))
+        self.client.force_authenticate(self.author)
+        # Fill the fragment cache, so the reads below show it was dropped.
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def get_rows(self):
+        return {
+            ingredient_id: (row_id, amount)
+            for row_id, ingredient_id, amount
+            in RecipeIngredient.objects.filter(
+                recipe=self.recipe
+            ).values_list('id', 'ingredient_id', 'amount')
+        }
+
+    def patch(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def get_shopping_list(self):
+        self.client.force_authenticate(self.buyer)
+        response = self.client.get(reverse('api:recipe-shopping-list'))
+        self.client.force_authenticate(self.author)
+        return {item['id']: item['amount'] for item in response.data}
+
+    def test_patch_changes_only_the_diff(self):
+        changed, kept, dropped = self.ingredients
+        rows = self.get_rows()
+        self.patch({
+            'ingredients': [
+                {'id': changed.id, 'amount': 25},
+                {'id': kept.id, 'amount': 10},
+            ],
+            'tags': [tag.id for tag in self.tags],
+        })
+
+        self.assertEqual(self.get_rows(), {
+            changed.id: (rows[changed.id][0], 25),
+            kept.id: rows[kept.id],
+        })
+        self.assertEqual(
+            set(self.recipe.tags.values_list('id', flat=True)),
+            {tag.id for tag in self.tags},
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'recipe')
+        self.assertEqual(self.get_shopping_list(), {
+            changed.id: 25,
+            kept.id: 10,
+        })
+
+        data = self.client.get(self.url).data
+        self.assertEqual(
+            {item['id']: item['amount'] for item in data['ingredients']},
+            {changed.id: 25, kept.id: 10},
+        )
+        self.assertEqual(
+            [tag['id'] for tag in data['tags']],
+            [tag.id for tag in self.tags],
+        )
+
+    def test_partial_patch_keeps_ingredients(self):
+        rows = self.get_rows()
+        self.patch({'name': 'renamed'})
+
+        self.assertEqual(self.get_rows(), rows)
+        self.assertEqual(
+            set(self.recipe.tags.values_list('id', flat=True)),
+            {tag.id for tag in self.tags[:2]},
+        )
+        self.assertEqual(
+            self.get_shopping_list(),
+            {ingredient.id: 10 for ingredient in self.ingredients},
+        )
+        data = self.client.get(self.url).data
+        self.assertEqual(data['name'], 'renamed')
+        self.assertEqual(len(data['ingredients']), len(self.ingredients))
@@ -0,0 +1,56 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from foodgram.testing import IsolatedCacheMixin
+from recipes.models import Tag
+
+
+class ReferenceDataTest(IsolatedCacheMixin, APITestCase):
+    """
+    Precompiled tag responses are revalidated against their version, or
+    cached for good under a URL naming it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='tag', slug='tag', color='#000000')
+
+    def test_revalidated_after_change(self):
+        url = reverse('api:tag-list')
+        response = self.client.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotIn('max-age', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'renamed'
+            self.tag.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'renamed')
+
+    def test_versioned_url_cached(self):
+        url = reverse('api:tag-list')
+        versioned_url = self.client.get(url)['Content-Location']
+        self.assertRegex(versioned_url, r'^/api/tags/\?v=\d+$')
+        response = self.client.get(versioned_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertNotIn('Content-Location', response)
+
+        detail_url = reverse('api:tag-detail', args=(self.tag.id,))
+        response = self.client.get(
+            self.client.get(detail_url)['Content-Location']
+        )
+        self.assertIn('immutable', response['Cache-Control'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'renamed'
+            self.tag.save()
+        response = self.client.get(versioned_url)
+        self.assertEqual(response.json()[0]['name'], 'renamed')
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotEqual(response['Content-Location'], versioned_url)
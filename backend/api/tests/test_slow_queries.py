@@ -0,0 +1,92 @@
+from hashlib import md5
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import serializers
+
+from api.models import SlowQuery
+from api.slow_queries import SlowQueryRecorder, normalize_sql, store
+from recipes.models import Tag
+from recipes.search import is_postgresql
+
+
+class NormalizeSqlTest(SimpleTestCase):
+
+    def test_literals(self):
+        self.assertEqual(
+            normalize_sql(
+                "SELECT * FROM t WHERE name = 'it''s' AND id = 42 "
+                'AND price > 1.5 AND slug = %s'
+            ),
+            'SELECT * FROM t WHERE name = ? AND id = ? AND price > ? '
+            'AND slug = ?',
+        )
+
+    def test_in_lists_collapse(self):
+        short = normalize_sql('SELECT * FROM t WHERE id IN (%s, %s)')
+        long = normalize_sql('SELECT * FROM t WHERE id IN (1, 2, 3, 4)')
+        self.assertEqual(short, 'SELECT * FROM t WHERE id IN (?, ...)')
+        self.assertEqual(
+            md5(short.encode()).hexdigest(), md5(long.encode()).hexdigest()
+        )
+
+    def test_identifiers_and_whitespace(self):
+        self.assertEqual(
+            normalize_sql('SELECT  "t1"."col2"\n FROM t1   LIMIT 21'),
+            'SELECT "t1"."col2" FROM t1 LIMIT ?',
+        )
+
+
+class TagCountField(serializers.Field):
+
+    def to_representation(self, value):
+        return Tag.objects.count()
+
+
+class ProbeSerializer(serializers.Serializer):
+    tags = TagCountField(source='*')
+
+
+@override_settings(SLOW_QUERY_SECONDS=0)
+class GetSourceTest(TestCase):
+    """Slow queries are attributed to the serializer field running them."""
+
+    def record(self, function):
+        recorder = SlowQueryRecorder(request=None)
+        with connection.execute_wrapper(recorder):
+            function()
+        return [source for *_, source in recorder.queries]
+
+    def test_serializer_field(self):
+        sources = self.record(lambda: ProbeSerializer({}).data)
+        self.assertEqual(sources, ['ProbeSerializer.tags'])
+
+    def test_project_code(self):
+        def count_tags():
+            return Tag.objects.count()
+
+        sources = self.record(count_tags)
+        self.assertEqual(len(sources), 1)
+        self.assertRegex(
+            sources[0], r'^api/tests/test_slow_queries\.py:\d+ count_tags$'
+        )
+
+
+@override_settings(SLOW_QUERY_SECONDS=1e-9, SLOW_QUERY_LOG='')
+class SlowQueryStoreTest(TestCase):
+
+    def test_rows_stored_on_postgresql_only(self):
+        with self.assertLogs('foodgram.slow_queries', 'WARNING'):
+            self.client.get('/api/users/')
+        self.assertEqual(SlowQuery.objects.exists(), is_postgresql())
+
+    def test_long_view_and_source_truncated(self):
+        view = 'GET ' + 'v' * 296
+        source = 's' * 300
+        for seconds in (2, 3):
+            store('0' * 32, view, source, 'SELECT ?', '', seconds)
+        query = SlowQuery.objects.get()
+        self.assertEqual(query.view, view[:200])
+        self.assertEqual(query.source, source[:200])
+        self.assertEqual(query.count, 2)
+        self.assertEqual(query.max_seconds, 3)
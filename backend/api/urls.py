@@ -1,8 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CustomUserCreateView, IngredientViewSet, RecipeViewSet,
-                    TagViewSet)
+from .views import (CustomUserCreateView, ExportView, IngredientViewSet,
+                    MetricsView, RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 
@@ -14,6 +14,8 @@ router_v1.register('ingredients', IngredientViewSet)
 router_v1.register('users', CustomUserCreateView)
 
 urlpatterns = [
+    path('export/', ExportView.as_view(), name='export'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router_v1.urls)),
 ]
 
@@ -1,29 +1,47 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.serializers import UserCreateSerializer
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from recipes.export import EXPORT_SECTIONS, gzip_stream, iter_export
+from recipes.feed import get_feed_sources
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 from users.models import Subscribe
-from .filters import IngredientSearchFilter, RecipeFilter
-from .pagination import RecipePagination, UserPagination
-from .permissions import IsAdminOrReadOnly
+from .autocomplete import ingredient_autocomplete
+from .conditional import (ingredient_versions, recipe_detail_versions,
+                          recipe_list_versions, tag_versions, user_versions,
+                          versioned_response)
+from .facets import recipe_index
+from .filters import RecipeFilter
+from .metrics import metrics_registry, render_metrics
+from .negotiation import FileFormatContentNegotiation
+from .pagination import FeedPagination, RecipePagination, UserPagination
+from .permissions import IsAdminOrReadOnly, IsStaffOrMetricsToken
+from .reference import (ingredient_reference, is_json_request,
+                        tag_reference)
 from .serializers import (FavoriteRecipeSerializer, IngredientSerializer,
                           RecipeReadSerializer, RecipeWriteSerializer,
-                          ShoppingCartSerializer, SubscribeSerializer,
-                          TagSerializer, UserSerializer, UserSubscriptionList)
+                          ShoppingCartSerializer, ShoppingListItemSerializer,
+                          SubscribeSerializer, TagSerializer, UserSerializer,
+                          UserSubscriptionList)
+from .shopping_list import SHOPPING_LIST_WRITERS, get_shopping_list_rows
 
 User = get_user_model()
 
 
+@method_decorator(versioned_response(user_versions), name='list')
+@method_decorator(versioned_response(user_versions), name='retrieve')
 class CustomUserCreateView(UserViewSet):
     """
     Custom User creation view with additional actions.
@@ -94,28 +112,83 @@ class CustomUserCreateView(UserViewSet):
         return self.get_paginated_response(subscriptions_data.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class ReferenceDataMixin:
+    """
+    Serve unfiltered JSON list and detail requests from precompiled
+    payloads, without touching the ORM or the serializers.
+    """
+
+    reference = None
+
+    def list(self, request, *args, **kwargs):
+        if is_json_request(request) and set(request.query_params) <= {
+            self.reference.version_query_param
+        }:
+            return self.reference.list_response(request)
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if is_json_request(request):
+            response = self.reference.detail_response(
+                request, kwargs[self.lookup_field]
+            )
+            if response is not None:
+                return response
+        return super().retrieve(request, *args, **kwargs)
+
+
+@method_decorator(
+    versioned_response(tag_versions, per_user=False), name='list'
+)
+@method_decorator(
+    versioned_response(tag_versions, per_user=False), name='retrieve'
+)
+class TagViewSet(ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
     """Read-only view for Tag model."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    reference = tag_reference
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    """Read-only view of the ingredient model with filtering support."""
+@method_decorator(
+    versioned_response(ingredient_versions, per_user=False), name='list'
+)
+@method_decorator(
+    versioned_response(ingredient_versions, per_user=False), name='retrieve'
+)
+class IngredientViewSet(ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only view of the ingredient model.
+    The name parameter is served by the in-memory autocomplete.
+    """
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
+    reference = ingredient_reference
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = int(request.query_params['limit'])
+        except (KeyError, ValueError):
+            limit = None
+        return Response(ingredient_autocomplete.search(name, limit))
 
 
+@method_decorator(versioned_response(recipe_list_versions), name='list')
+@method_decorator(versioned_response(recipe_detail_versions), name='retrieve')
 class RecipeViewSet(viewsets.ModelViewSet):
     """
     CRUD operations for Recipe model.
     - favorite: Add or remove a recipe from favorites.
     - shopping_cart: Add or remove a recipe from the shopping cart.
-    - download_shopping_cart: Download the shopping cart as a txt format. file.
+    - facets: Count recipes per tag for the current filters.
+    - feed: Get the newest recipes of the subscribed authors.
+    - shopping_list: Get the ingredient totals of the shopping cart.
+    - download_shopping_cart: Download the shopping cart as txt, csv or json.
     """
 
     queryset = Recipe.objects.all()
@@ -175,47 +248,114 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def delete_shopping_cart(self, request, pk):
         return self.delete_recipe(ShoppingCart, request.user, pk)
 
+    @action(
+        detail=False,
+        methods=('get',),
+    )
+    def facets(self, request):
+        """Count recipes per tag for the current recipe list filters."""
+        return Response(
+            recipe_index.get_facets(request.user, request.query_params)
+        )
+
     @action(
         detail=False,
         methods=('get',),
         permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
     )
-    def download_shopping_cart(self, request):
-        """Method for downloading a shopping list in txt format."""
+    def feed(self, request):
+        """Return the newest recipes of the authors the user follows."""
+        page = self.paginate_queryset(get_feed_sources(request.user))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
-        user = request.user
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_list(self, request):
+        """Return the stored ingredient totals of the shopping cart."""
+        items = ShoppingListItem.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by('ingredient__name')
+        return Response(ShoppingListItemSerializer(items, many=True).data)
 
-        shopping_list = self.generate_shopping_list(user)
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=FileFormatContentNegotiation,
+    )
+    def download_shopping_cart(self, request, format=None):
+        """
+        Stream the shopping list as a file.
+        The format suffix or query parameter selects txt (default), csv
+        or json.
+        """
+
+        file_format = format or request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_LIST_WRITERS:
+            raise NotFound(f'Unknown file format {file_format!r}')
+        media_type, writer = SHOPPING_LIST_WRITERS[file_format]
+        user = request.user
+        rows = get_shopping_list_rows(user)
 
-        filename = f'{user.username}_shopping_list.txt'
-        response = HttpResponse(
-            shopping_list,
-            content_type='text/plain; charset=utf-8'
+        filename = f'{user.username}_shopping_list.{file_format}'
+        response = StreamingHttpResponse(
+            writer(user, rows),
+            content_type=f'{media_type}; charset=utf-8'
         )
         response['Content-Disposition'] = f'attachment; filename={filename}'
 
         return response
 
-    def generate_shopping_list(self, user):
-        """Generate a list of products that need to be bought."""
 
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__cart__user=user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
+class ExportView(APIView):
+    """
+    Stream the dataset as NDJSON for staff.
+    - sections: comma separated sections to export, all by default.
+    - gzip: compress the stream when set to 1.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        sections = request.query_params.get('sections')
+        if sections:
+            sections = sections.split(',')
+            unknown = set(sections) - set(EXPORT_SECTIONS)
+            if unknown:
+                return Response(
+                    {'sections': f'Unknown sections: '
+                                 f'{", ".join(sorted(unknown))}'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        lines = iter_export(sections or None)
+
+        if request.query_params.get('gzip') == '1':
+            response = StreamingHttpResponse(
+                gzip_stream(lines), content_type='application/gzip'
+            )
+            filename = 'export.ndjson.gz'
+        else:
+            response = StreamingHttpResponse(
+                lines, content_type='application/x-ndjson; charset=utf-8'
+            )
+            filename = 'export.ndjson'
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+
+        return response
 
-        shopping_list = (f'{user.first_name}, '
-                         f'You need to buy the following:\n\n')
 
-        shopping_list += '\n'.join([
-            f'- {ingredient["ingredient__name"]} '
-            f'({ingredient["ingredient__measurement_unit"]})'
-            f' - {ingredient["amount"]}'
-            for ingredient in ingredients
-        ])
+class MetricsView(APIView):
+    """Request metrics of all workers in the Prometheus text format."""
 
-        shopping_list += 'We look forward to seeing you again on our website!'
+    permission_classes = (IsStaffOrMetricsToken,)
 
-        return shopping_list
+    def get(self, request):
+        return HttpResponse(
+            render_metrics(metrics_registry.collect()),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
@@ -28,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.SlowQueryMiddleware",
+    "api.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -76,8 +78,24 @@ else:
         }
     }
 
+# Cached responses are invalidated through version counters kept in the
+# cache, so every worker and management command has to share it.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+    }
+}
+
 AUTH_USER_MODEL = 'users.User'
 
+TEST_RUNNER = 'foodgram.testing.TestRunner'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -122,6 +140,27 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are streamed to a temporary file in chunks instead of memory.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Threads resizing uploaded recipe images, 0 processes them on commit.
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Directory where every worker process keeps its request metrics, so
+# /api/metrics/ can sum them up; empty keeps them in the process only.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+# Bearer token letting a scraper read /api/metrics/ without a staff user.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Queries of API requests taking longer than this many seconds are
+# logged with their plans, and on PostgreSQL listed in the admin;
+# 0 turns it off.
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_SECONDS', 0.2))
+# Rotating file the slow queries are written to, if set.
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', '')
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CSRF_TRUSTED_ORIGINS = os.environ.get('CSRF_TRUSTED_ORIGINS',
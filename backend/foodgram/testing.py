@@ -0,0 +1,52 @@
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def isolated_cache_settings(directory):
+    return override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }
+    })
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Run the tests against a cache directory of their own, so they can
+    never clear or read the cache of a running site.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='foodgram-test-cache-')
+        self.cache_settings = isolated_cache_settings(self.cache_dir)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+
+class IsolatedCacheMixin:
+    """
+    Give every test an empty cache. Version counters are only bumped on
+    commit, which never comes inside TestCase, so counters and fragments
+    left by an earlier test would otherwise be served to the next one.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.use_empty_cache()
+
+    def use_empty_cache(self):
+        """Switch to a new empty cache until the end of the test."""
+        directory = tempfile.mkdtemp(prefix='foodgram-test-cache-')
+        self.addCleanup(shutil.rmtree, directory, True)
+        cache_settings = isolated_cache_settings(directory)
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
@@ -0,0 +1,27 @@
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+from api.metrics import metrics_registry  # noqa: E402
+
+
+def on_starting(server):
+    """Start the request metrics from zero with every server start."""
+    metrics_registry.reset()
+
+
+def worker_exit(server, worker):
+    """
+    Finish the image variants queued in the worker, then write its last
+    requests to its metrics file.
+    """
+    # Imported here, the models are loaded only with the application.
+    from recipes.images import image_processor
+
+    image_processor.shutdown()
+    metrics_registry.save()
+
+
+def child_exit(server, worker):
+    """Move the metrics of an exited worker out of its pid's file."""
+    metrics_registry.retire(worker.pid)
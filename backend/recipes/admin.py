@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.utils.html import format_html
 
 from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
+from .search import update_documents
 
 EXTRA_INGREDIENTS_FIELDS = 5
 MINIMUM_REQUIRED = 1
@@ -33,12 +34,17 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = [RecipeIngredientInline]
     list_filter = ('name', 'author', 'tags')
     list_display = ('name', 'author', 'total_favorites')
+    readonly_fields = Recipe.counter_fields
     search_fields = ('name', 'author__username')
     search_help_text = 'Search recipe by name or author username'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_documents((form.instance.id,))
+
     @admin.display(description='Total Favorites')
     def total_favorites(self, recipe):
-        return recipe.favorites.count()
+        return recipe.favorites_count
 
 
 @admin.register(Tag)
@@ -59,3 +65,4 @@ admin.site.register(Ingredient)
 admin.site.register(RecipeIngredient)
 admin.site.register(FavoriteRecipe)
 admin.site.register(ShoppingCart)
+admin.site.register(ShoppingListItem)
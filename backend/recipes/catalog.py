@@ -0,0 +1,207 @@
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+from .models import Ingredient, Tag
+from .search import is_postgresql
+
+BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+
+# Catalog name: model, CSV column order, natural key and the fields
+# updated when a row with the same key already exists.
+CATALOGS = {
+    'ingredients': (
+        Ingredient, ('name', 'measurement_unit'),
+        ('name', 'measurement_unit'), (),
+    ),
+    'tags': (Tag, ('name', 'slug', 'color'), ('slug',), ('name', 'color')),
+}
+
+
+class CatalogError(Exception):
+    """A catalog file or row that cannot be loaded."""
+
+
+def iter_json_array(json_file):
+    """Yield the items of a JSON array without reading it all at once."""
+    decoder = json.JSONDecoder()
+    buffer = json_file.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CatalogError('a JSON file must hold an array')
+    buffer = buffer[1:]
+    separated = True
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(']'):
+            return
+        if buffer.startswith(',') and not separated:
+            buffer = buffer[1:]
+            separated = True
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = json_file.read(READ_SIZE)
+            if not chunk:
+                raise CatalogError('the JSON file is invalid or truncated')
+            buffer += chunk
+            continue
+        if not separated:
+            raise CatalogError('the JSON file is invalid')
+        yield item
+        buffer = buffer[end:]
+        separated = False
+
+
+def read_rows(catalog_file, file_format, columns):
+    """Yield (row number, row) pairs of a CSV, JSON or NDJSON file."""
+    if file_format == 'csv':
+        for number, values in enumerate(csv.reader(catalog_file), 1):
+            if values:
+                yield number, dict(zip(columns, values))
+    elif file_format == 'json':
+        yield from enumerate(iter_json_array(catalog_file), 1)
+    else:
+        for number, line in enumerate(catalog_file, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, None
+
+
+def clean_row(model, columns, row):
+    if not isinstance(row, dict):
+        raise CatalogError('a row must be a JSON object')
+    values = {}
+    for column in columns:
+        value = row.get(column)
+        if not isinstance(value, str):
+            raise CatalogError(f'{column}: a string is required')
+        values[column] = value.strip()
+    try:
+        model(**values).clean_fields()
+    except ValidationError as error:
+        raise CatalogError('; '.join(
+            f'{field}: {" ".join(messages)}'
+            for field, messages in error.message_dict.items()
+        ))
+    return values
+
+
+class CatalogLoader:
+    """
+    Sync a catalog table with rows read from a file. Rows are deduplicated
+    by their natural key in memory and written in batches, so a batch
+    costs a few queries however many rows it holds. Existing rows are
+    only written when one of the update fields differs.
+    """
+
+    def __init__(self, catalog):
+        self.model, self.columns, self.key, self.fields = CATALOGS[catalog]
+        self.seen = set()
+        self.inserted = self.updated = self.unchanged = 0
+
+    def add(self, row):
+        """Return the cleaned row, or None if its key was already seen."""
+        values = clean_row(self.model, self.columns, row)
+        key = tuple(values[field] for field in self.key)
+        if key in self.seen:
+            return None
+        self.seen.add(key)
+        return values
+
+    def write(self, rows):
+        if not rows:
+            return
+        if is_postgresql():
+            self.upsert(rows)
+        else:
+            self.merge(rows)
+
+    def get_existing(self, rows):
+        lookup = Q()
+        for field in self.key:
+            lookup &= Q(**{f'{field}__in': {row[field] for row in rows}})
+        return {
+            tuple(getattr(instance, field) for field in self.key): instance
+            for instance in self.model.objects.filter(lookup)
+        }
+
+    def merge(self, rows):
+        """Portable path: one lookup query, then bulk insert and update."""
+        existing = self.get_existing(rows)
+        new, changed = [], []
+        for row in rows:
+            instance = existing.get(tuple(row[field] for field in self.key))
+            if instance is None:
+                new.append(self.model(**row))
+            elif any(getattr(instance, field) != row[field]
+                     for field in self.fields):
+                for field in self.fields:
+                    setattr(instance, field, row[field])
+                changed.append(instance)
+            else:
+                self.unchanged += 1
+        # Conflicts are not ignored: a new tag whose name or color is
+        # taken must fail the sync rather than vanish from the counts.
+        self.model.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        if changed:
+            self.model.objects.bulk_update(
+                changed, self.fields, batch_size=BATCH_SIZE
+            )
+        self.inserted += len(new)
+        self.updated += len(changed)
+
+    def upsert(self, rows):
+        """
+        PostgreSQL path: COPY the batch into a staging table and merge it
+        with one INSERT ... ON CONFLICT. RETURNING reports the written rows
+        and xmax tells inserted ones from updated ones.
+        """
+        table = self.model._meta.db_table
+        staging = f'{table}_staging'
+        columns = ', '.join(self.columns)
+        key = ', '.join(self.key)
+        if self.fields:
+            conflict = (
+                'DO UPDATE SET {} WHERE ({}) IS DISTINCT FROM ({})'
+            ).format(
+                ', '.join(f'{field} = EXCLUDED.{field}'
+                          for field in self.fields),
+                ', '.join(f'{table}.{field}' for field in self.fields),
+                ', '.join(f'EXCLUDED.{field}' for field in self.fields),
+            )
+        else:
+            conflict = 'DO NOTHING'
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for row in rows:
+            writer.writerow([row[column] for column in self.columns])
+        data.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} '
+                f'ON COMMIT DROP AS SELECT {columns} FROM {table} '
+                f'WITH NO DATA'
+            )
+            cursor.execute(f'TRUNCATE {staging}')
+            cursor.copy_expert(
+                f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                data,
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT {columns} FROM {staging} '
+                f'ON CONFLICT ({key}) {conflict} '
+                f'RETURNING xmax = 0'
+            )
+            written = [inserted for inserted, in cursor.fetchall()]
+        self.inserted += sum(written)
+        self.updated += len(written) - sum(written)
+        self.unchanged += len(rows) - len(written)
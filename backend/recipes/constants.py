@@ -1,8 +1,27 @@
-HEX_REGEX_PATTERN = r'#([A-Fa-f0-9]{6})|#([A-Fa-f0-9]{3})|#([A-Fa-f0-9]{8})'
-
-DEFAULT_FIELD_LENGHT = 200
-MIN_VALUE_REQUIRED = 1
-MAX_VALUE_LIMIT = 32000
-
-MIN_VALUE_REQUIRED_MESSAGE = 'Must be at least 1.'
-MAX_VALUE_LIMIT_MESSAGE = 'Cannot be greater than 32000'
+HEX_REGEX_PATTERN = r'#([A-Fa-f0-9]{6})|#([A-Fa-f0-9]{3})|#([A-Fa-f0-9]{8})'
+
+DEFAULT_FIELD_LENGHT = 200
+MIN_VALUE_REQUIRED = 1
+MAX_VALUE_LIMIT = 32000
+
+MIN_VALUE_REQUIRED_MESSAGE = 'Must be at least 1.'
+MAX_VALUE_LIMIT_MESSAGE = 'Cannot be greater than 32000'
+
+# Recipes of authors with more subscribers are not copied into the
+# followers' feeds but read directly.
+FEED_FANOUT_LIMIT = 1000
+
+# Resized copies of recipe images: name -> largest width and height.
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Unreferenced image files younger than this are kept, as the recipe
+# saving them may not have been committed yet.
+IMAGE_GC_GRACE_PERIOD = 60 * 60 * 24
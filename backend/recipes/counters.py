@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Subscribe
+from .models import FavoriteRecipe, Recipe, ShoppingCart
+
+User = get_user_model()
+
+# (model holding the counter, counter field, counted model, FK to the holder)
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscribe, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Atomically add delta to a stored counter, never going below zero."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def actual_count(counted_model, relation):
+    """Subquery counting the related rows of the outer object."""
+    return Coalesce(
+        Subquery(
+            counted_model.objects.filter(
+                **{relation: OuterRef('pk')}
+            ).order_by().values(relation).annotate(
+                total=Count('pk')
+            ).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def find_drift(model, field, counted_model, relation):
+    """Return the ids of objects whose stored counter is out of date."""
+    return list(
+        model.objects.annotate(
+            actual=actual_count(counted_model, relation)
+        ).exclude(**{field: F('actual')}).values_list('pk', flat=True)
+    )
+
+
+def repair_counter(model, field, counted_model, relation, ids=None):
+    queryset = model.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    return queryset.update(**{field: actual_count(counted_model, relation)})
@@ -0,0 +1,117 @@
+import zlib
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+
+from users.models import Subscribe
+from .models import FavoriteRecipe, Recipe, RecipeIngredient, ShoppingCart
+
+User = get_user_model()
+
+# Rows fetched per round trip of the server-side cursor.
+CHUNK_SIZE = 2000
+# Recipes whose tags and ingredients are read with one query each,
+# kept below the SQLite limit on query parameters.
+RECIPE_BATCH_SIZE = 500
+
+USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'is_staff',
+    'date_joined',
+)
+RECIPE_FIELDS = ('id', 'name', 'text', 'cooking_time', 'image', 'pub_date')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def export_users():
+    return User.objects.order_by('id').values(*USER_FIELDS).iterator(
+        chunk_size=CHUNK_SIZE
+    )
+
+
+def export_recipes():
+    """
+    Yield recipes in the line format of import_recipes, with the author's
+    username, tag slugs and ingredients inline.
+    """
+    rows = Recipe.objects.order_by('id').values(
+        'author__username', *RECIPE_FIELDS
+    ).iterator(chunk_size=CHUNK_SIZE)
+    for batch in batched(rows, RECIPE_BATCH_SIZE):
+        recipe_ids = [row['id'] for row in batch]
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag__slug').values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, measurement_unit, amount in (
+            RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids
+            ).order_by('id').values_list(
+                'recipe_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount',
+            )
+        ):
+            ingredients[recipe_id].append({
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            })
+        for row in batch:
+            row['author'] = row.pop('author__username')
+            row['tags'] = tags[row['id']]
+            row['ingredients'] = ingredients[row['id']]
+            yield row
+
+
+def export_relation(model, *fields):
+    def export():
+        return model.objects.order_by('id').values(*fields).iterator(
+            chunk_size=CHUNK_SIZE
+        )
+    return export
+
+
+# Sections in the order they are written, users before what refers
+# to them.
+EXPORT_SECTIONS = {
+    'users': export_users,
+    'recipes': export_recipes,
+    'favorites': export_relation(FavoriteRecipe, 'user_id', 'recipe_id'),
+    'shopping_cart': export_relation(ShoppingCart, 'user_id', 'recipe_id'),
+    'subscriptions': export_relation(Subscribe, 'user_id', 'author_id'),
+}
+
+
+def iter_export(sections=None):
+    """
+    Yield NDJSON lines of the given sections, all of them by default.
+    Each line is an object with its section name under "type"; rows are
+    read in chunks, so memory use does not grow with the dataset.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for section, export in EXPORT_SECTIONS.items():
+        if sections is not None and section not in sections:
+            continue
+        for row in export():
+            yield encoder.encode({'type': section, **row}) + '\n'
+
+
+def gzip_stream(lines, size=CHUNK_SIZE):
+    """Compress text lines into gzip chunks while they are produced."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for batch in batched(lines, size):
+        chunk = compressor.compress(''.join(batch).encode())
+        if chunk:
+            yield chunk
+    yield compressor.flush()
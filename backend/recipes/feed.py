@@ -0,0 +1,119 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+
+from users.models import Subscribe
+from .constants import FEED_FANOUT_LIMIT
+from .models import FeedEntry, Recipe
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def is_fanned_out(author_id):
+    """Check whether the author's recipes are copied into the feeds."""
+    return User.objects.filter(
+        pk=author_id, subscribers_count__lte=FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out_recipe(recipe):
+    """Add a new recipe to the feeds of its author's subscribers."""
+    fan_out_recipes((recipe,))
+
+
+def fan_out_recipes(recipes):
+    """
+    Add new recipes to the feeds of their authors' subscribers, reading
+    the subscribers of all the authors with one query.
+    """
+    by_author = defaultdict(list)
+    for recipe in recipes:
+        by_author[recipe.author_id].append(recipe)
+    if not by_author:
+        return
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe.id,
+                author_id=author_id,
+                pub_date=recipe.pub_date,
+            )
+            for author_id, user_id in Subscribe.objects.filter(
+                author_id__in=by_author,
+                author__subscribers_count__lte=FEED_FANOUT_LIMIT,
+            ).values_list('author_id', 'user_id').iterator()
+            for recipe in by_author[author_id]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_ids, author_id):
+    """Add all recipes of the author to the feeds of the given users."""
+    recipes = list(
+        Recipe.objects.filter(author_id=author_id).values_list(
+            'id', 'pub_date'
+        )
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id in user_ids
+            for recipe_id, pub_date in recipes
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def subscribe(user_id, author_id):
+    if is_fanned_out(author_id):
+        backfill((user_id,), author_id)
+
+
+def unsubscribe(user_id, author_id):
+    """
+    Trim the author's recipes from the feed. When the author falls back
+    to the fan-out limit, the remaining subscribers get the recipes that
+    were only read directly while the author had more subscribers.
+    """
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    if User.objects.filter(
+        pk=author_id, subscribers_count=FEED_FANOUT_LIMIT
+    ).exists():
+        backfill(
+            Subscribe.objects.filter(author_id=author_id).values_list(
+                'user_id', flat=True
+            ),
+            author_id,
+        )
+
+
+def get_feed_sources(user):
+    """
+    Return the querysets making up the user's feed with the names of
+    their publication date and recipe id fields: the stored feed entries
+    and the recipes of subscribed authors that are not fanned out.
+    """
+    sources = [(FeedEntry.objects.filter(user=user), 'pub_date', 'recipe_id')]
+    popular_authors = list(
+        Subscribe.objects.filter(
+            user=user, author__subscribers_count__gt=FEED_FANOUT_LIMIT
+        ).values_list('author_id', flat=True)
+    )
+    if popular_authors:
+        sources.append((
+            Recipe.objects.filter(author_id__in=popular_authors),
+            'pub_date',
+            'id',
+        ))
+    return sources
@@ -0,0 +1,208 @@
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .constants import IMAGE_FORMATS, IMAGE_GC_GRACE_PERIOD, IMAGE_VARIANTS
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/variants'
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def render_variants(source):
+    """
+    Return {(variant, extension): bytes} for every size and format.
+    The image is rotated according to its EXIF orientation and saved
+    without any metadata; transparency is kept in WebP only.
+    """
+    rendered = {}
+    with Image.open(source) as original:
+        transparent = has_alpha(original)
+        image = ImageOps.exif_transpose(original).convert(
+            'RGBA' if transparent else 'RGB'
+        )
+    for name, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        for extension, (image_format, options) in IMAGE_FORMATS.items():
+            frame = resized
+            if transparent and image_format == 'JPEG':
+                frame = Image.new('RGB', resized.size, 'white')
+                frame.paste(resized, mask=resized.getchannel('A'))
+            buffer = BytesIO()
+            frame.save(buffer, image_format, **options)
+            rendered[name, extension] = buffer.getvalue()
+    return rendered
+
+
+def is_processed(recipe):
+    return recipe.image_variants.get('source') == recipe.image.name
+
+
+def get_variant_paths(variants):
+    return [
+        path for name in IMAGE_VARIANTS
+        for path in variants.get(name, {}).values()
+    ]
+
+
+def get_variant_urls(recipe):
+    """
+    Return {variant: {extension: url}} of the recipe image. Until the
+    variants are ready every one of them points at the original.
+    """
+    if not recipe.image:
+        return {}
+    processed = is_processed(recipe)
+    return {
+        name: {
+            extension: (
+                default_storage.url(recipe.image_variants[name][extension])
+                if processed else recipe.image.url
+            )
+            for extension in IMAGE_FORMATS
+        }
+        for name in IMAGE_VARIANTS
+    }
+
+
+def get_variant_path(source, name, extension):
+    """Variants are named after their source, so recipes share them."""
+    stem = PurePosixPath(source).stem
+    return f'{VARIANTS_DIR}/{stem[:2]}/{stem}-{name}.{extension}'
+
+
+def process_recipe_image(recipe_id, overwrite=False):
+    """
+    Store the resized variants of the recipe image, rendering only those
+    that do not exist yet unless overwrite is set. Nothing is saved to the
+    recipe if its image was replaced or the recipe deleted meanwhile.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    source = recipe.image.name
+    variants = {'source': source}
+    missing = {}
+    for name in IMAGE_VARIANTS:
+        for extension in IMAGE_FORMATS:
+            path = get_variant_path(source, name, extension)
+            variants.setdefault(name, {})[extension] = path
+            if overwrite or not default_storage.exists(path):
+                missing[name, extension] = path
+    if missing:
+        with recipe.image.open('rb') as image_file:
+            rendered = render_variants(image_file)
+        for key, path in missing.items():
+            if overwrite:
+                default_storage.delete(path)
+            saved = default_storage.save(path, ContentFile(rendered[key]))
+            if saved != path:
+                # Another worker stored the same variant first.
+                default_storage.delete(saved)
+    with transaction.atomic():
+        recipe = Recipe.objects.select_for_update().filter(
+            pk=recipe_id
+        ).first()
+        if recipe is not None and recipe.image.name == source:
+            recipe.image_variants = variants
+            recipe.save(update_fields=('image_variants',))
+
+
+def walk_files(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from walk_files(storage, posixpath.join(directory, name))
+
+
+def find_orphan_images():
+    """
+    Return recipe image files referenced neither as a recipe image nor
+    as one of its variants and older than the grace period.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    referenced = set()
+    for image, variants in Recipe.objects.values_list(
+        'image', 'image_variants'
+    ).iterator():
+        referenced.add(image)
+        referenced.update(get_variant_paths(variants))
+    upload_to = Recipe._meta.get_field('image').upload_to.rstrip('/')
+    if not storage.exists(upload_to):
+        return []
+    cutoff = timezone.now() - timedelta(seconds=IMAGE_GC_GRACE_PERIOD)
+    return [
+        path for path in walk_files(storage, upload_to)
+        if path not in referenced and storage.get_modified_time(path) < cutoff
+    ]
+
+
+class ImageProcessor:
+    """
+    Pool of worker threads resizing uploaded recipe images.
+    Work is submitted once the saving transaction commits, so the request
+    does not wait for it. With IMAGE_WORKERS set to 0 images are processed
+    right on commit instead.
+    """
+
+    executor = None
+    lock = threading.Lock()
+
+    def schedule(self, recipe_id):
+        transaction.on_commit(lambda: self.submit(recipe_id))
+
+    def submit(self, recipe_id):
+        if not settings.IMAGE_WORKERS:
+            self.process(recipe_id)
+            return
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_WORKERS,
+                    thread_name_prefix='recipe-images',
+                )
+            executor = self.executor
+        executor.submit(self.run, recipe_id)
+
+    def process(self, recipe_id):
+        try:
+            process_recipe_image(recipe_id)
+        except Exception:
+            logger.exception('Could not process image of recipe %s',
+                             recipe_id)
+
+    def shutdown(self):
+        """Finish the queued images, before the worker process exits."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def run(self, recipe_id):
+        try:
+            self.process(recipe_id)
+        finally:
+            connection.close()
+
+
+image_processor = ImageProcessor()
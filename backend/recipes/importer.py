@@ -0,0 +1,235 @@
+import os
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .counters import change_counter
+from .feed import fan_out_recipes
+from .images import image_processor
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .search import update_documents
+from .signals import bulk_changed
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+class RecipeImportError(Exception):
+    """A line of the import file that cannot be turned into a recipe."""
+
+
+class RecipeImporter:
+    """
+    Turn parsed NDJSON lines into recipes and write them in bulk.
+    Tags, ingredients and authors are resolved through lookup maps
+    loaded once, so a line costs no queries until its chunk is written.
+    """
+
+    def __init__(self, images_dir=None):
+        self.images_dir = images_dir
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredient_ids = set(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        self.ingredients = {
+            (name, measurement_unit): ingredient_id
+            for ingredient_id, name, measurement_unit
+            in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        self.authors = {}
+        for user_id, username, email in User.objects.values_list(
+            'id', 'username', 'email'
+        ):
+            self.authors[username] = self.authors[email] = user_id
+        self.image_field = Recipe._meta.get_field('image')
+
+    def get_author(self, data):
+        author = data.get('author')
+        if not isinstance(author, str) or author not in self.authors:
+            raise RecipeImportError(f'unknown author {author!r}')
+        return self.authors[author]
+
+    def get_tags(self, data):
+        slugs = data.get('tags')
+        if not slugs or not isinstance(slugs, list):
+            raise RecipeImportError('a recipe needs at least one tag')
+        if not all(isinstance(slug, str) for slug in slugs):
+            raise RecipeImportError('tags must be slugs')
+        unknown = [slug for slug in slugs if slug not in self.tags]
+        if unknown:
+            raise RecipeImportError(f'unknown tags {unknown!r}')
+        return {self.tags[slug] for slug in slugs}
+
+    @staticmethod
+    def get_integer(data, field_name):
+        # clean_fields() would truncate 2.7 and accept '3' silently.
+        value = data.get(field_name)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise RecipeImportError(
+                f'{field_name} must be an integer, got {value!r}'
+            )
+        return value
+
+    def get_ingredient_id(self, item):
+        if 'id' in item:
+            if (not isinstance(item['id'], int) or isinstance(item['id'], bool)
+                    or item['id'] not in self.ingredient_ids):
+                raise RecipeImportError(
+                    f'unknown ingredient id {item["id"]!r}'
+                )
+            return item['id']
+        key = (item.get('name'), item.get('measurement_unit'))
+        if (not all(isinstance(value, str) for value in key)
+                or key not in self.ingredients):
+            raise RecipeImportError(f'unknown ingredient {key!r}')
+        return self.ingredients[key]
+
+    def get_ingredients(self, data):
+        items = data.get('ingredients')
+        if not items or not isinstance(items, list):
+            raise RecipeImportError(
+                'a recipe needs at least one ingredient'
+            )
+        amounts = {}
+        for item in items:
+            if not isinstance(item, dict):
+                raise RecipeImportError('ingredients must be objects')
+            ingredient_id = self.get_ingredient_id(item)
+            if ingredient_id in amounts:
+                raise RecipeImportError(
+                    'ingredients of a recipe must be unique'
+                )
+            amounts[ingredient_id] = self.get_integer(item, 'amount')
+        return amounts
+
+    def get_image_path(self, data):
+        image = data.get('image')
+        if not isinstance(image, str) or not image or not self.images_dir:
+            raise RecipeImportError(
+                'an image and --images-dir are required'
+            )
+        path = os.path.join(self.images_dir, os.path.basename(image))
+        if not os.path.isfile(path):
+            raise RecipeImportError(f'image {image!r} not found')
+        return path
+
+    def build(self, data):
+        """
+        Validate one line and return (recipe, tag ids, ingredient amounts,
+        image path, pub_date) without touching the database.
+        """
+        if not isinstance(data, dict):
+            raise RecipeImportError('a line must be a JSON object')
+        recipe = Recipe(
+            author_id=self.get_author(data),
+            name=data.get('name'),
+            text=data.get('text'),
+            cooking_time=data.get('cooking_time'),
+        )
+        pub_date = data.get('pub_date')
+        if pub_date is not None:
+            pub_date = parse_datetime(str(pub_date))
+            if pub_date is None:
+                raise RecipeImportError(
+                    f'invalid pub_date {data["pub_date"]!r}'
+                )
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+        tags = self.get_tags(data)
+        ingredients = self.get_ingredients(data)
+        image_path = self.get_image_path(data)
+        self.get_integer(data, 'cooking_time')
+        try:
+            recipe.clean_fields(exclude=('author', 'image', 'pub_date'))
+            for amount in ingredients.values():
+                RecipeIngredient(amount=amount).clean_fields(
+                    exclude=('recipe', 'ingredient')
+                )
+        except ValidationError as error:
+            raise RecipeImportError('; '.join(
+                f'{field}: {" ".join(messages)}'
+                for field, messages in error.message_dict.items()
+            ))
+        return recipe, tags, ingredients, image_path, pub_date
+
+    def save_image(self, recipe, path):
+        """Stream the image file into the recipe image storage."""
+        with open(path, 'rb') as image_file:
+            name = self.image_field.generate_filename(
+                recipe, os.path.basename(path)
+            )
+            recipe.image = self.image_field.storage.save(
+                name, File(image_file)
+            )
+
+    @staticmethod
+    def assign_ids(recipes):
+        if recipes and recipes[0].pk is None:
+            # SQLite returns no ids from bulk inserts before Django 4.0,
+            # but it serializes writers, so while the transaction is open
+            # the new rows are the ones with the highest ids.
+            ids = Recipe.objects.order_by('-id').values_list(
+                'id', flat=True
+            )[:len(recipes)]
+            for recipe, recipe_id in zip(recipes, reversed(ids)):
+                recipe.pk = recipe_id
+
+    def write(self, rows):
+        """
+        Insert a chunk of built rows in one transaction and apply what the
+        skipped model signals would have done.
+        """
+        for recipe, _, _, image_path, _ in rows:
+            self.save_image(recipe, image_path)
+        recipes = [row[0] for row in rows]
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes, batch_size=BATCH_SIZE)
+            self.assign_ids(recipes)
+            # auto_now_add overrides the date on insert, so imported
+            # dates are written afterwards.
+            dated = []
+            for recipe, *_, pub_date in rows:
+                if pub_date is not None:
+                    recipe.pub_date = pub_date
+                    dated.append(recipe)
+            Recipe.objects.bulk_update(
+                dated, ('pub_date',), batch_size=BATCH_SIZE
+            )
+            Recipe.tags.through.objects.bulk_create(
+                (
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                    for recipe, tags, *_ in rows
+                    for tag_id in tags
+                ),
+                batch_size=BATCH_SIZE,
+            )
+            RecipeIngredient.objects.bulk_create(
+                (
+                    RecipeIngredient(
+                        recipe_id=recipe.pk,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for recipe, _, ingredients, *_ in rows
+                    for ingredient_id, amount in ingredients.items()
+                ),
+                batch_size=BATCH_SIZE,
+            )
+            for author_id, total in Counter(
+                recipe.author_id for recipe in recipes
+            ).items():
+                change_counter(User, author_id, 'recipes_count', total)
+            update_documents(recipe.pk for recipe in recipes)
+            fan_out_recipes(recipes)
+            for recipe in recipes:
+                image_processor.schedule(recipe.pk)
+            bulk_changed.send(sender=Recipe)
+        return len(recipes)
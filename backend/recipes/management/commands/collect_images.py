@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import find_orphan_images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Find recipe image files no recipe refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Delete the unreferenced files'
+        )
+
+    def handle(self, *args, **kwargs):
+        orphans = find_orphan_images()
+
+        if orphans and kwargs['delete']:
+            storage = Recipe._meta.get_field('image').storage
+            for path in orphans:
+                storage.delete(path)
+
+        if not orphans:
+            self.stdout.write(
+                self.style.SUCCESS('No unreferenced image files.')
+            )
+        elif kwargs['delete']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {len(orphans)} unreferenced image files.'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Found {len(orphans)} unreferenced image files. '
+                f'Run with --delete to remove them.'
+            ))
@@ -0,0 +1,58 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.export import EXPORT_SECTIONS, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Export recipes, users and their relations as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file_path',
+            nargs='?',
+            help='Path to the output file, standard output by default'
+        )
+        parser.add_argument(
+            '--sections',
+            nargs='+',
+            choices=tuple(EXPORT_SECTIONS),
+            help='Sections to export, all of them by default'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output, implied by a .gz file name'
+        )
+
+    def handle(self, *args, **kwargs):
+        file_path = kwargs['file_path']
+        compress = kwargs['gzip'] or (file_path or '').endswith('.gz')
+        if file_path is None and compress:
+            raise CommandError('--gzip needs an output file')
+
+        try:
+            if file_path is None:
+                total = self.write(self.stdout, kwargs['sections'])
+            elif compress:
+                with gzip.open(file_path, 'wt', encoding='utf-8') as file:
+                    total = self.write(file, kwargs['sections'])
+            else:
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    total = self.write(file, kwargs['sections'])
+        except OSError as error:
+            raise CommandError(f'Cannot write {file_path}: {error}')
+
+        if file_path is not None:
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully exported data. | Total lines: {total}'
+            ))
+
+    @staticmethod
+    def write(file, sections):
+        total = 0
+        for line in iter_export(sections):
+            file.write(line)
+            total += 1
+        return total
@@ -0,0 +1,108 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.importer import RecipeImporter, RecipeImportError
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Import recipes from an NDJSON file, one recipe per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file_path',
+            type=str,
+            help='Path to the NDJSON file'
+        )
+        parser.add_argument(
+            '--images-dir',
+            type=str,
+            help='Directory with the image files named in the lines'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Recipes written per transaction'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help='File keeping the last imported line, '
+                 'defaults to the input path with .progress appended'
+        )
+
+    def handle(self, *args, **kwargs):
+        file_path = kwargs['file_path']
+        chunk_size = kwargs['chunk_size']
+        checkpoint = kwargs['checkpoint'] or f'{file_path}.progress'
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+        if not os.path.isfile(file_path):
+            raise CommandError(f'File {file_path} does not exist')
+
+        done = self.read_checkpoint(checkpoint)
+        if done:
+            self.stdout.write(f'Resuming after line {done}.')
+
+        importer = RecipeImporter(kwargs['images_dir'])
+        started = time.monotonic()
+        imported = skipped = 0
+        rows = []
+        line_number = done
+
+        with open(file_path, 'r', encoding='utf-8') as ndjson_file:
+            for line_number, line in enumerate(ndjson_file, 1):
+                if line_number <= done or not line.strip():
+                    continue
+                try:
+                    rows.append(importer.build(json.loads(line)))
+                except (ValueError, RecipeImportError) as error:
+                    skipped += 1
+                    self.stderr.write(f'Line {line_number}: {error}')
+                if len(rows) >= chunk_size:
+                    imported += importer.write(rows)
+                    rows = []
+                    self.write_checkpoint(checkpoint, line_number)
+                    self.report(imported, skipped, started)
+            if rows:
+                imported += importer.write(rows)
+            self.write_checkpoint(checkpoint, line_number)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported recipes. | '
+            f'Total imported: {imported} | '
+            f'Skipped lines: {skipped} | '
+            f'{self.get_rate(imported, started):.0f} recipes/s'
+        ))
+
+    @staticmethod
+    def read_checkpoint(checkpoint):
+        try:
+            with open(checkpoint, 'r', encoding='utf-8') as progress_file:
+                return int(progress_file.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            raise CommandError(f'Checkpoint {checkpoint} is corrupted')
+
+    @staticmethod
+    def write_checkpoint(checkpoint, line_number):
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as progress_file:
+            progress_file.write(str(line_number))
+        os.replace(temporary, checkpoint)
+
+    @staticmethod
+    def get_rate(imported, started):
+        return imported / max(time.monotonic() - started, 1e-6)
+
+    def report(self, imported, skipped, started):
+        self.stdout.write(
+            f'Imported {imported} recipes, skipped {skipped} lines '
+            f'({self.get_rate(imported, started):.0f} recipes/s)'
+        )
@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from recipes.catalog import (BATCH_SIZE, CATALOGS, CatalogError,
+                             CatalogLoader, read_rows)
+from recipes.signals import bulk_changed
+
+FORMATS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'ndjson',
+           '.jsonl': 'ndjson'}
+
+
+class Command(BaseCommand):
+    help = 'Sync tags or ingredients with a CSV, JSON or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'catalog',
+            choices=sorted(CATALOGS),
+            help='Catalog to sync'
+        )
+        parser.add_argument(
+            'file_path',
+            type=str,
+            help='Path to the CSV, JSON or NDJSON file'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Rows written per batch'
+        )
+
+    def handle(self, *args, **kwargs):
+        file_path = kwargs['file_path']
+        batch_size = kwargs['batch_size']
+        extension = file_path[file_path.rfind('.'):].lower()
+        if extension not in FORMATS:
+            raise CommandError('Unsupported file format')
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+
+        loader = CatalogLoader(kwargs['catalog'])
+        started = time.monotonic()
+        total = skipped = 0
+        batch = []
+
+        try:
+            with open(file_path, 'r', encoding='utf-8', newline='') as file, \
+                    transaction.atomic():
+                for number, row in read_rows(
+                    file, FORMATS[extension], loader.columns
+                ):
+                    total += 1
+                    try:
+                        values = loader.add(row)
+                    except CatalogError as error:
+                        skipped += 1
+                        self.stderr.write(f'Row {number}: {error}')
+                        continue
+                    if values is None:
+                        skipped += 1
+                        continue
+                    batch.append(values)
+                    if len(batch) >= batch_size:
+                        loader.write(batch)
+                        batch = []
+                loader.write(batch)
+                if loader.inserted or loader.updated:
+                    bulk_changed.send(sender=loader.model)
+        except OSError as error:
+            raise CommandError(f'Cannot read {file_path}: {error}')
+        except CatalogError as error:
+            raise CommandError(str(error))
+        except IntegrityError as error:
+            raise CommandError(f'Rows clash with existing ones: {error}')
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully synced {kwargs["catalog"]}. | '
+            f'Inserted: {loader.inserted} | '
+            f'Updated: {loader.updated} | '
+            f'Unchanged: {loader.unchanged} | '
+            f'Skipped: {skipped} | '
+            f'{total / elapsed:.0f} rows/s'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import is_processed, process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Create resized variants of recipe images that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recreate variants of every recipe image'
+        )
+
+    def handle(self, *args, **kwargs):
+        processed = 0
+        previous = None
+
+        # Recipes sharing an image share its variants, ordering by image
+        # lets --all render them once.
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_variants'
+        ).order_by('image', 'id')
+        for recipe in recipes.iterator():
+            if kwargs['all'] or not is_processed(recipe):
+                process_recipe_image(
+                    recipe.id,
+                    overwrite=kwargs['all'] and recipe.image.name != previous,
+                )
+                processed += 1
+            previous = recipe.image.name
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Processed {processed} recipe images.')
+        )
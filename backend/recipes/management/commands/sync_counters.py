@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import COUNTERS, find_drift, repair_counter
+
+
+class Command(BaseCommand):
+    help = 'Check stored favorites, cart, recipe and subscriber counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Repair counters that are out of date'
+        )
+
+    def handle(self, *args, **kwargs):
+        total_drift = 0
+
+        for model, field, counted_model, relation in COUNTERS:
+            with transaction.atomic():
+                drift = find_drift(model, field, counted_model, relation)
+                if drift and kwargs['fix']:
+                    repair_counter(
+                        model, field, counted_model, relation, ids=drift
+                    )
+            total_drift += len(drift)
+            self.stdout.write(
+                f'{model._meta.model_name}.{field}: '
+                f'{len(drift)} out of date'
+            )
+
+        if not total_drift:
+            self.stdout.write(self.style.SUCCESS('All counters are correct.'))
+        elif kwargs['fix']:
+            self.stdout.write(
+                self.style.SUCCESS(f'Repaired {total_drift} counters.')
+            )
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Found {total_drift} out of date counters. '
+                f'Run with --fix to repair them.'
+            ))
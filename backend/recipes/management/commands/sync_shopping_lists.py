@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.shopping_list import find_drift, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Check stored shopping lists against the shopping carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rebuild shopping lists that are out of date'
+        )
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            drift = find_drift()
+            if drift and kwargs['fix']:
+                rebuild(drift)
+
+        if not drift:
+            self.stdout.write(
+                self.style.SUCCESS('All shopping lists are correct.')
+            )
+        elif kwargs['fix']:
+            self.stdout.write(
+                self.style.SUCCESS(f'Rebuilt {len(drift)} shopping lists.')
+            )
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Found {len(drift)} out of date shopping lists. '
+                f'Run with --fix to rebuild them.'
+            ))
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'recipes_recipe_search'
+
+POSTGRESQL_FORWARD = (
+    f'CREATE TABLE {SEARCH_TABLE} ('
+    'recipe_id bigint PRIMARY KEY REFERENCES recipes_recipe (id) '
+    'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+    'document tsvector NOT NULL)',
+    f'CREATE INDEX {SEARCH_TABLE}_document ON {SEARCH_TABLE} '
+    'USING GIN (document)',
+    f'INSERT INTO {SEARCH_TABLE} (recipe_id, document) '
+    'SELECT r.id, '
+    "setweight(to_tsvector('simple', r.name), 'A') || "
+    "setweight(to_tsvector('simple', "
+    "coalesce(string_agg(i.name, ' '), '')), 'B') || "
+    "setweight(to_tsvector('simple', r.text), 'C') "
+    'FROM recipes_recipe r '
+    'LEFT JOIN recipes_recipeingredient ri ON ri.recipe_id = r.id '
+    'LEFT JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    'GROUP BY r.id',
+)
+
+SQLITE_FORWARD = (
+    f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+    "name, ingredients, text, tokenize = 'unicode61 remove_diacritics 2')",
+    f'INSERT INTO {SEARCH_TABLE} (rowid, name, ingredients, text) '
+    "SELECT r.id, r.name, coalesce(group_concat(i.name, ' '), ''), r.text "
+    'FROM recipes_recipe r '
+    'LEFT JOIN recipes_recipeingredient ri ON ri.recipe_id = r.id '
+    'LEFT JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    'GROUP BY r.id',
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        statements = POSTGRESQL_FORWARD
+    else:
+        statements = SQLITE_FORWARD
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -3,9 +3,11 @@ from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
 from django.db import models
 
+from users.models import StoredCountersMixin
 from .constants import (DEFAULT_FIELD_LENGHT, HEX_REGEX_PATTERN,
                         MAX_VALUE_LIMIT, MAX_VALUE_LIMIT_MESSAGE,
                         MIN_VALUE_REQUIRED, MIN_VALUE_REQUIRED_MESSAGE)
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -51,9 +53,11 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(StoredCountersMixin, models.Model):
     """Recipe model."""
 
+    counter_fields = ('favorites_count', 'shopping_cart_count')
+
     tags = models.ManyToManyField(
         'Tag',
         related_name='recipe',
@@ -78,6 +82,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Image',
         upload_to='recipes/',
+        storage=ContentAddressedStorage(),
     )
     text = models.TextField(
         'Text',
@@ -100,9 +105,35 @@ class Recipe(models.Model):
         'Publication Date',
         auto_now_add=True,
     )
+    image_variants = models.JSONField(
+        'Image variants',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Total Favorites',
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        'Total in shopping carts',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
 
@@ -233,3 +264,91 @@ class FavoriteRecipe(FavoriteRecipeShoppingCartRelation):
         verbose_name = 'Favorite Recipe'
         verbose_name_plural = 'Favorite Recipes'
         default_related_name = 'favorites'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Ingredient total of a user's shopping list.
+    Maintained incrementally from shopping carts and recipe ingredients.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='User',
+    )
+    ingredient = models.ForeignKey(
+        'Ingredient',
+        on_delete=models.CASCADE,
+        verbose_name='Ingredient',
+    )
+    amount = models.PositiveIntegerField(
+        'Amount',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+        verbose_name = 'Shopping list item'
+        verbose_name_plural = 'Shopping list items'
+        default_related_name = 'shopping_list'
+
+    def __str__(self) -> str:
+        return f'{self.ingredient.name}: {self.amount}'
+
+
+class FeedEntry(models.Model):
+    """
+    Recipe in the feed of a subscriber of its author.
+    Author and publication date are copied from the recipe, so a page of
+    the feed is read from a single index.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Subscriber',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Recipe',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Author',
+    )
+    pub_date = models.DateTimeField(
+        'Publication Date',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_page_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_entry_author_idx'
+            ),
+        ]
+        verbose_name = 'Feed entry'
+        verbose_name_plural = 'Feed entries'
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.recipe}'
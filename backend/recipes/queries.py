@@ -0,0 +1,38 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Recipe
+
+SHORT_RECIPE_FIELDS = ('id', 'author', 'name', 'image', 'image_variants',
+                       'cooking_time', 'pub_date')
+
+
+def get_latest_recipes(author_ids, limit=None):
+    """
+    Return the newest recipes of the given authors, grouped by author.
+    With a limit, at most limit recipes of every author are selected in
+    one query ranked by ROW_NUMBER() over each author's recipes.
+    """
+    author_ids = list(author_ids)
+    recipes = Recipe.objects.filter(
+        author_id__in=author_ids
+    ).only(*SHORT_RECIPE_FIELDS)
+    if limit is None:
+        return list(recipes.order_by('author_id', '-pub_date', '-id'))
+    if limit <= 0 or not author_ids:
+        return []
+    ranked = recipes.annotate(
+        recipe_rank=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )
+    ).order_by()
+    # Window functions cannot be filtered on before Django 4.2, so the
+    # ranked query is wrapped in a raw one.
+    sql, params = ranked.query.sql_with_params()
+    return list(Recipe.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE ranked.recipe_rank <= %s '
+        f'ORDER BY ranked.author_id, ranked.recipe_rank',
+        (*params, limit),
+    ))
@@ -0,0 +1,120 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Ingredient, Recipe, RecipeIngredient
+
+SEARCH_TABLE = 'recipes_recipe_search'
+SEARCH_CONFIG = 'simple'
+# Relative weights of name, ingredients and text in the ranking.
+SQLITE_WEIGHTS = '10.0, 5.0, 1.0'
+
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def get_search_terms(query):
+    return [word.lower() for word in WORD_PATTERN.findall(query)]
+
+
+def update_documents(recipe_ids):
+    """
+    Rebuild the search documents of the given recipes in the current
+    transaction. Ids of deleted recipes just lose their documents.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    recipe_table = Recipe._meta.db_table
+    through_table = RecipeIngredient._meta.db_table
+    ingredient_table = Ingredient._meta.db_table
+    joins = (
+        f'FROM {recipe_table} r '
+        f'LEFT JOIN {through_table} ri ON ri.recipe_id = r.id '
+        f'LEFT JOIN {ingredient_table} i ON i.id = ri.ingredient_id '
+    )
+    remove_documents(recipe_ids)
+    with connection.cursor() as cursor:
+        if is_postgresql():
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (recipe_id, document) '
+                f'SELECT r.id, '
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', r.name), 'A') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', "
+                f"coalesce(string_agg(i.name, ' '), '')), 'B') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', r.text), 'C') "
+                f'{joins}WHERE r.id = ANY(%s) GROUP BY r.id',
+                [recipe_ids],
+            )
+        else:
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} '
+                f'(rowid, name, ingredients, text) '
+                f'SELECT r.id, r.name, '
+                f"coalesce(group_concat(i.name, ' '), ''), r.text "
+                f'{joins}WHERE r.id IN ({placeholders}) GROUP BY r.id',
+                recipe_ids,
+            )
+
+
+def remove_documents(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    with connection.cursor() as cursor:
+        if is_postgresql():
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE recipe_id = ANY(%s)',
+                [recipe_ids],
+            )
+        else:
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids,
+            )
+
+
+def search_recipes(queryset, query):
+    """
+    Filter recipes matching every word of the query as a prefix and
+    annotate them with search_rank, lower values meaning better matches.
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return queryset.none()
+    recipe_table = Recipe._meta.db_table
+    if is_postgresql():
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        matches = RawSQL(
+            f'SELECT recipe_id FROM {SEARCH_TABLE} '
+            f"WHERE document @@ to_tsquery('{SEARCH_CONFIG}', %s)",
+            (tsquery,),
+        )
+        rank = RawSQL(
+            f'SELECT -ts_rank(document, '
+            f"to_tsquery('{SEARCH_CONFIG}', %s)) "
+            f'FROM {SEARCH_TABLE} WHERE recipe_id = {recipe_table}.id',
+            (tsquery,),
+        )
+    else:
+        match = ' '.join(f'"{term}"*' for term in terms)
+        matches = RawSQL(
+            f'SELECT rowid FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s',
+            (match,),
+        )
+        rank = RawSQL(
+            f'SELECT bm25({SEARCH_TABLE}, {SQLITE_WEIGHTS}) '
+            f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            f'AND rowid = {recipe_table}.id',
+            (match,),
+        )
+    return queryset.filter(id__in=matches).annotate(
+        search_rank=rank
+    ).order_by('search_rank', '-pub_date', '-id')
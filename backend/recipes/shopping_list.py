@@ -0,0 +1,139 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+@transaction.atomic
+def apply_deltas(deltas):
+    """
+    Add {(user_id, ingredient_id): delta} to the stored shopping lists.
+    The users' rows are locked first, so concurrent changes of one list
+    wait for each other instead of inserting the same item twice. Items
+    dropping to zero are removed and deltas for missing items are only
+    applied when they are positive.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    user_ids = sorted({user_id for user_id, _ in deltas})
+    list(
+        User.objects.select_for_update().filter(
+            id__in=user_ids
+        ).order_by('id').values_list('id', flat=True)
+    )
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.filter(
+            user_id__in=user_ids,
+            ingredient_id__in={ingredient_id for _, ingredient_id in deltas},
+        )
+    }
+    created, changed, removed = [], [], []
+    for (user_id, ingredient_id), delta in deltas.items():
+        item = items.get((user_id, ingredient_id))
+        if item is None:
+            if delta > 0:
+                created.append(ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=delta
+                ))
+        elif item.amount + delta > 0:
+            item.amount += delta
+            changed.append(item)
+        else:
+            removed.append(item.id)
+    if removed:
+        ShoppingListItem.objects.filter(id__in=removed).delete()
+    if changed:
+        ShoppingListItem.objects.bulk_update(
+            changed, ('amount',), batch_size=BATCH_SIZE
+        )
+    if created:
+        ShoppingListItem.objects.bulk_create(created, batch_size=BATCH_SIZE)
+
+
+def change_cart(user_id, recipe_id, sign):
+    """Add (sign=1) or remove (sign=-1) a recipe from a user's list."""
+    apply_deltas({
+        (user_id, ingredient_id): sign * amount
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    })
+
+
+def change_recipe_ingredients(recipe_id, changes):
+    """
+    Apply {ingredient_id: delta} of a recipe's ingredients to the lists
+    of every user having the recipe in the shopping cart.
+    """
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    apply_deltas({
+        (user_id, ingredient_id): delta
+        for user_id in ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)
+        for ingredient_id, delta in changes.items()
+    })
+
+
+def expected_items(user_ids=None):
+    """Compute {user_id: {ingredient_id: amount}} from the carts."""
+    # One filter() call, so both conditions apply to the same cart join.
+    lookups = {'recipe__cart__isnull': False}
+    if user_ids is not None:
+        lookups['recipe__cart__user__in'] = user_ids
+    expected = defaultdict(dict)
+    for user_id, ingredient_id, amount in RecipeIngredient.objects.filter(
+        **lookups
+    ).values(
+        'recipe__cart__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by().values_list(
+        'recipe__cart__user', 'ingredient', 'total'
+    ).iterator():
+        expected[user_id][ingredient_id] = amount
+    return expected
+
+
+def stored_items():
+    stored = defaultdict(dict)
+    for user_id, ingredient_id, amount in ShoppingListItem.objects.values_list(
+        'user_id', 'ingredient_id', 'amount'
+    ).iterator():
+        stored[user_id][ingredient_id] = amount
+    return stored
+
+
+def find_drift():
+    """Return the ids of users whose stored shopping list is out of date."""
+    expected = expected_items()
+    stored = stored_items()
+    return sorted(
+        user_id for user_id in expected.keys() | stored.keys()
+        if expected.get(user_id, {}) != stored.get(user_id, {})
+    )
+
+
+@transaction.atomic
+def rebuild(user_ids):
+    """Recompute the stored shopping lists of the given users."""
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for user_id, items in expected_items(user_ids).items()
+            for ingredient_id, amount in items.items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
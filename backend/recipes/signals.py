@@ -0,0 +1,116 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from users.models import Subscribe
+from .counters import COUNTERS, change_counter
+from .feed import fan_out_recipe, subscribe, unsubscribe
+from .images import image_processor, is_processed
+from .models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from .search import remove_documents, update_documents
+from .shopping_list import change_cart, change_recipe_ingredients
+
+# Sent with the model as sender after its rows were written in bulk,
+# which sends no model signals.
+bulk_changed = Signal()
+
+
+def connect_counter(model, field, counted_model, relation):
+    """Keep a stored counter in sync with inserts and deletes."""
+    attname = counted_model._meta.get_field(relation).attname
+
+    def increment(sender, instance, created, raw=False, **kwargs):
+        if created and not raw:
+            change_counter(model, getattr(instance, attname), field, 1)
+
+    def decrement(sender, instance, **kwargs):
+        change_counter(model, getattr(instance, attname), field, -1)
+
+    post_save.connect(increment, sender=counted_model, weak=False,
+                      dispatch_uid=f'{field}_increment')
+    post_delete.connect(decrement, sender=counted_model, weak=False,
+                        dispatch_uid=f'{field}_decrement')
+
+
+for counter in COUNTERS:
+    connect_counter(*counter)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_documents((instance.id,))
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, raw=False, **kwargs):
+    if not raw and instance.image and not is_processed(instance):
+        image_processor.schedule(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_feeds(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fan_out_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    remove_documents((instance.id,))
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, raw=False,
+                               **kwargs):
+    if not created and not raw:
+        update_documents(
+            instance.recipeingredient_set.values_list('recipe_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_cart(instance.user_id, instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    change_cart(instance.user_id, instance.recipe_id, -1)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(sender, instance, raw=False, **kwargs):
+    instance._saved_ingredient = None
+    if instance.pk is not None and not raw:
+        instance._saved_ingredient = RecipeIngredient.objects.filter(
+            pk=instance.pk
+        ).values_list('ingredient_id', 'amount').first()
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def change_shopping_lists(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    changes = {instance.ingredient_id: instance.amount}
+    if instance._saved_ingredient is not None:
+        ingredient_id, amount = instance._saved_ingredient
+        changes[ingredient_id] = changes.get(ingredient_id, 0) - amount
+    change_recipe_ingredients(instance.recipe_id, changes)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def shrink_shopping_lists(sender, instance, **kwargs):
+    change_recipe_ingredients(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
+
+
+@receiver(post_save, sender=Subscribe)
+def fill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        subscribe(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def trim_feed(sender, instance, **kwargs):
+    unsubscribe(instance.user_id, instance.author_id)
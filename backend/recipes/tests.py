@@ -0,0 +1,376 @@
+import os
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from PIL import Image
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from foodgram.testing import IsolatedCacheMixin
+from users.models import Subscribe
+from .counters import change_counter
+from .feed import fan_out_recipes
+from .images import get_variant_paths
+from .importer import RecipeImporter, RecipeImportError
+from .models import (FeedEntry, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, ShoppingListItem, Tag)
+
+User = get_user_model()
+
+
+class StoredCountersTest(TestCase):
+    """A save of an instance loaded earlier keeps concurrent increments."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='First',
+            last_name='Last',
+            password='password',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='recipe',
+            text='text',
+            cooking_time=10,
+            image='recipes/recipe.png',
+        )
+
+    def test_recipe_save_keeps_counters(self):
+        recipe = Recipe.objects.get(id=self.recipe.id)
+        change_counter(Recipe, recipe.id, 'favorites_count', 1)
+        change_counter(Recipe, recipe.id, 'shopping_cart_count', 2)
+        recipe.name = 'renamed'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'renamed')
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.shopping_cart_count, 2)
+
+    def test_user_save_keeps_counters(self):
+        user = User.objects.get(id=self.author.id)
+        change_counter(User, user.id, 'subscribers_count', 3)
+        user.set_password('new password')
+        user.save()
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('new password'))
+        self.assertEqual(user.recipes_count, 1)
+        self.assertEqual(user.subscribers_count, 3)
+
+    def test_counters_saved_when_named(self):
+        recipe = Recipe.objects.get(id=self.recipe.id)
+        recipe.favorites_count = 5
+        recipe.save(update_fields=('favorites_count',))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 5)
+
+
+class FanOutRecipesTest(TestCase):
+    """New recipes reach the feeds with one read and one insert."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = []
+        for number in range(3):
+            cls.authors.append(User.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name='First',
+                last_name='Last',
+                password='password',
+            ))
+        cls.subscriber = cls.authors.pop()
+        for author in cls.authors:
+            Subscribe.objects.create(user=cls.subscriber, author=author)
+
+    def test_batch_queries(self):
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=self.authors[number % len(self.authors)],
+                name=f'recipe{number}',
+                text='text',
+                cooking_time=10,
+                image='recipes/recipe.png',
+            )
+            for number in range(6)
+        )
+        # Loaded again, bulk_create sets no ids on SQLite before Django 4.0.
+        recipes = list(Recipe.objects.order_by('id'))
+        with self.assertNumQueries(2):
+            fan_out_recipes(recipes)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.subscriber
+            ).values_list('recipe_id', flat=True)),
+            {recipe.id for recipe in recipes},
+        )
+
+
+class RecipeImporterTest(TestCase):
+    """Lines with values of the wrong type are rejected, not fatal."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='First',
+            last_name='Last',
+            password='password',
+        )
+        Tag.objects.create(name='tag', slug='tag', color='#000000')
+        Ingredient.objects.create(name='salt', measurement_unit='g')
+
+    def test_unhashable_values(self):
+        importer = RecipeImporter()
+        for data in (
+            {'author': ['author']},
+            {'author': 'author', 'tags': [['tag']]},
+            {'author': 'author', 'tags': ['tag'],
+             'ingredients': [{'id': [1], 'amount': 1}]},
+            {'author': 'author', 'tags': ['tag'],
+             'ingredients': [{'name': {}, 'measurement_unit': 'g'}]},
+            {'author': 'author', 'tags': ['tag'],
+             'ingredients': [{'name': 'salt', 'measurement_unit': 'g',
+                              'amount': 1}],
+             'image': ['image.png']},
+        ):
+            with self.subTest(data=data):
+                with self.assertRaises(RecipeImportError):
+                    importer.build(data)
+
+    def test_integer_amounts(self):
+        salt = Ingredient.objects.get()
+        with TemporaryDirectory() as images_dir:
+            open(os.path.join(images_dir, 'image.png'), 'wb').close()
+            importer = RecipeImporter(images_dir)
+            data = {
+                'author': 'author',
+                'name': 'recipe',
+                'text': 'text',
+                'cooking_time': 10,
+                'tags': ['tag'],
+                'ingredients': [{'id': salt.id, 'amount': 3}],
+                'image': 'image.png',
+            }
+            _, _, ingredients, *_ = importer.build(data)
+            self.assertEqual(ingredients, {salt.id: 3})
+            for amount in (2.7, 3.0, '3', True, None):
+                with self.subTest(amount=amount):
+                    with self.assertRaises(RecipeImportError):
+                        importer.build({**data, 'ingredients': [
+                            {'id': salt.id, 'amount': amount}
+                        ]})
+            for cooking_time in (2.7, '10'):
+                with self.subTest(cooking_time=cooking_time):
+                    with self.assertRaises(RecipeImportError):
+                        importer.build({**data, 'cooking_time': cooking_time})
+
+
+class ShoppingListTest(IsolatedCacheMixin, APITestCase):
+    """
+    The stored shopping list always equals the ingredient totals of the
+    recipes in the cart, whatever changed the cart or the recipes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.buyer = (
+            User.objects.create_user(
+                email=f'{username}@example.com',
+                username=username,
+                first_name='First',
+                last_name='Last',
+                password='password',
+            )
+            for username in ('author', 'buyer')
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{number}', measurement_unit='g'
+            )
+            for number in range(3)
+        ]
+        cls.recipes = []
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.author,
+                name=f'recipe{number}',
+                text='text',
+                cooking_time=10,
+                image='recipes/recipe.png',
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=(number + 1) * 10 + index,
+                )
+                for index, ingredient in enumerate(
+                    cls.ingredients[number:]
+                )
+            )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.buyer)
+        for recipe in self.recipes[:2]:
+            response = self.client.post(
+                reverse('api:recipe-shopping-cart', args=(recipe.id,))
+            )
+            self.assertEqual(response.status_code, 201)
+
+    def assert_shopping_list(self):
+        expected = dict(
+            RecipeIngredient.objects.filter(
+                recipe__cart__user=self.buyer
+            ).values('ingredient').annotate(
+                total=Sum('amount')
+            ).order_by().values_list('ingredient', 'total')
+        )
+        response = self.client.get(reverse('api:recipe-shopping-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {item['id']: item['amount'] for item in response.data},
+            expected,
+        )
+        return expected
+
+    def test_cart_changes(self):
+        self.assertEqual(self.assert_shopping_list(), {
+            self.ingredients[0].id: 10,
+            self.ingredients[1].id: 11 + 20,
+            self.ingredients[2].id: 12 + 21,
+        })
+        url = reverse('api:recipe-shopping-cart', args=(self.recipes[2].id,))
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assert_shopping_list()
+        for recipe in self.recipes:
+            url = reverse('api:recipe-shopping-cart', args=(recipe.id,))
+            self.assertEqual(self.client.delete(url).status_code, 204)
+            self.assert_shopping_list()
+        self.assertFalse(
+            ShoppingListItem.objects.filter(user=self.buyer).exists()
+        )
+
+    def test_amount_change(self):
+        item = RecipeIngredient.objects.get(
+            recipe=self.recipes[1], ingredient=self.ingredients[1]
+        )
+        item.amount = 5
+        item.save()
+        self.assertEqual(
+            self.assert_shopping_list()[self.ingredients[1].id], 11 + 5
+        )
+
+    def test_ingredient_change(self):
+        item = RecipeIngredient.objects.get(
+            recipe=self.recipes[0], ingredient=self.ingredients[0]
+        )
+        item.ingredient = self.ingredients[1]
+        RecipeIngredient.objects.filter(
+            recipe=self.recipes[0], ingredient=self.ingredients[1]
+        ).delete()
+        item.save()
+        self.assertNotIn(self.ingredients[0].id, self.assert_shopping_list())
+
+    def test_ingredient_removal(self):
+        RecipeIngredient.objects.get(
+            recipe=self.recipes[0], ingredient=self.ingredients[0]
+        ).delete()
+        self.assertNotIn(self.ingredients[0].id, self.assert_shopping_list())
+        RecipeIngredient.objects.filter(recipe=self.recipes[1]).delete()
+        self.assertEqual(self.assert_shopping_list(), {
+            self.ingredients[1].id: 11,
+            self.ingredients[2].id: 12,
+        })
+
+    def test_recipe_deletion(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(
+            reverse('api:recipe-detail', args=(self.recipes[0].id,))
+        )
+        self.assertEqual(response.status_code, 204)
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.assert_shopping_list(), {
+            self.ingredients[1].id: 20,
+            self.ingredients[2].id: 21,
+        })
+
+    def test_sync_rebuilds_same_totals(self):
+        expected = self.assert_shopping_list()
+        ShoppingListItem.objects.filter(
+            user=self.buyer, ingredient=self.ingredients[0]
+        ).delete()
+        ShoppingListItem.objects.filter(
+            user=self.buyer, ingredient=self.ingredients[1]
+        ).update(amount=1)
+        ShoppingListItem.objects.create(
+            user=self.author, ingredient=self.ingredients[2], amount=7
+        )
+        call_command('sync_shopping_lists', fix=True, stdout=StringIO())
+        self.assertEqual(self.assert_shopping_list(), expected)
+        self.assertFalse(
+            ShoppingListItem.objects.filter(user=self.author).exists()
+        )
+        ShoppingCart.objects.filter(user=self.buyer).delete()
+        call_command('sync_shopping_lists', fix=True, stdout=StringIO())
+        self.assertEqual(self.assert_shopping_list(), {})
+
+
+class ProcessImagesTest(TestCase):
+    """process_images fills in missing variants, --all renders them anew."""
+
+    def setUp(self):
+        media_root = TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='First',
+            last_name='Last',
+            password='password',
+        )
+        buffer = BytesIO()
+        Image.new('RGB', (64, 48), 'red').save(buffer, 'PNG')
+        self.recipe = Recipe(
+            author=author, name='recipe', text='text', cooking_time=10
+        )
+        self.recipe.image.save(
+            'recipe.png', ContentFile(buffer.getvalue()), save=False
+        )
+        self.recipe.save()
+
+    def get_variants(self):
+        self.recipe.refresh_from_db()
+        return get_variant_paths(self.recipe.image_variants)
+
+    def test_missing_and_all(self):
+        call_command('process_images', stdout=StringIO())
+        paths = self.get_variants()
+        self.assertTrue(paths)
+        for path in paths:
+            default_storage.delete(path)
+            default_storage.save(path, ContentFile(b'stale'))
+
+        call_command('process_images', stdout=StringIO())
+        with default_storage.open(paths[0]) as variant:
+            self.assertEqual(variant.read(), b'stale')
+
+        call_command('process_images', all=True, stdout=StringIO())
+        self.assertEqual(self.get_variants(), paths)
+        for path in paths:
+            with default_storage.open(path) as variant:
+                self.assertNotEqual(variant.read(), b'stale')
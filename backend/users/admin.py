@@ -13,6 +13,7 @@ class AdminUser(UserAdmin):
     - 'USERNAME_FIELD from the User model is used for creating a user.'
     - 'Total number of recipes for the user is displayed.'
     - 'Total number of subscribers for the user is displayed.'
+    - 'Stored counters are shown read-only on the change form.'
 
     Search is available by email or username.
     """
@@ -30,6 +31,10 @@ class AdminUser(UserAdmin):
         }),
     )
 
+    fieldsets = UserAdmin.fieldsets + (
+        ('Counters', {'fields': User.counter_fields}),
+    )
+    readonly_fields = User.counter_fields
     list_display = ('username', 'email', 'total_recipe', 'subscribers_count')
     search_fields = ('username', 'email',)
     list_filter = ('is_staff',)
@@ -38,11 +43,7 @@ class AdminUser(UserAdmin):
 
     @admin.display(description='Total Recipes')
     def total_recipe(self, user):
-        return user.recipe.all().count()
-
-    @admin.display(description='Subscribers count')
-    def subscribers_count(self, user):
-        return user.subscribers.all().count()
+        return user.recipes_count
 
 
 admin.site.register(Subscribe)
@@ -0,0 +1,53 @@
+# Generated by Django 3.2 on 2026-10-17 06:57
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(counted_model, relation):
+    return Coalesce(
+        Subquery(
+            counted_model.objects.filter(
+                **{relation: OuterRef('pk')}
+            ).order_by().values(relation).annotate(
+                total=Count('pk')
+            ).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_user_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    User.objects.update(
+        recipes_count=count_related(
+            apps.get_model('recipes', 'Recipe'), 'author'
+        ),
+        subscribers_count=count_related(
+            apps.get_model('users', 'Subscribe'), 'author'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_user_options'),
+        ('recipes', '0012_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total Recipes'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Subscribers count'),
+        ),
+        migrations.RunPython(fill_user_counters, migrations.RunPython.noop),
+    ]
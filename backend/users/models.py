@@ -4,11 +4,33 @@ from django.db import models
 DEFAULT_NAME_LENGTH = 150
 
 
-class User(AbstractUser):
+class StoredCountersMixin:
+    """
+    Leave the stored counters out of saves of existing rows, unless they
+    are named in update_fields. Counters are changed with F() updates,
+    and a full save of an instance loaded earlier would write its
+    outdated values back over concurrent changes.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if (update_fields is None and not self._state.adding
+                and not kwargs.get('force_insert')):
+            skipped = {*self.counter_fields, *self.get_deferred_fields()}
+            update_fields = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class User(StoredCountersMixin, AbstractUser):
     """Custom user model."""
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name',)
+    counter_fields = ('recipes_count', 'subscribers_count')
 
     first_name = models.CharField('first name', max_length=DEFAULT_NAME_LENGTH)
     last_name = models.CharField('last name', max_length=DEFAULT_NAME_LENGTH)
@@ -16,6 +38,16 @@ class User(AbstractUser):
         'email address',
         unique=True,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Total Recipes',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Subscribers count',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         """